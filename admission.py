@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+# Largest photo accepted with a single report
+MAX_UPLOAD_MB = int(os.environ.get("LOSTANDFOUND_MAX_UPLOAD_MB", 5))
+# Photo bytes all submissions being processed at once may hold between them
+MAX_INFLIGHT_UPLOAD_MB = int(os.environ.get("LOSTANDFOUND_MAX_INFLIGHT_UPLOAD_MB", 40))
+# Sustained submissions per minute and burst size for one browser session
+SUBMISSIONS_PER_MINUTE = float(os.environ.get("LOSTANDFOUND_SUBMISSIONS_PER_MINUTE", 6))
+SUBMISSION_BURST = int(os.environ.get("LOSTANDFOUND_SUBMISSION_BURST", 3))
+# An IP address gets this many sessions' worth, so a venue's shared Wi-Fi still works
+SESSIONS_PER_IP = 10
+# Submissions processed at once, how many more may wait, and for how long
+WORKERS = int(os.environ.get("LOSTANDFOUND_SUBMISSION_WORKERS", 4))
+QUEUE_SIZE = int(os.environ.get("LOSTANDFOUND_SUBMISSION_QUEUE", 16))
+QUEUE_TIMEOUT = 5.0
+
+# Rate limit buckets kept; the least recently used client is forgotten first
+MAX_CLIENTS = 10000
+
+REJECTION_REASONS = ('too_large', 'rate_limited', 'busy')
+
+
+# Raised when a submission is turned away; `message` is shown to the user
+class Rejected(Exception):
+    def __init__(self, reason, message, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+
+# Token bucket: holds up to `capacity` tokens and refills at `rate` per second
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until a token is available; 0 if one was taken
+    def take(self):
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+# Decides whether a submission may run now. Checks, cheapest first: photo size,
+# the client's rate limit, then a processing slot and upload budget. Waiting for
+# a slot is bounded in both queue length and time, so a spike is answered with
+# "busy, retry" instead of piling up photos in memory.
+class AdmissionController:
+    def __init__(self, max_upload_bytes=MAX_UPLOAD_MB * MB, max_inflight_bytes=MAX_INFLIGHT_UPLOAD_MB * MB,
+                 per_minute=SUBMISSIONS_PER_MINUTE, burst=SUBMISSION_BURST, workers=WORKERS,
+                 queue_size=QUEUE_SIZE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_upload_bytes = max_upload_bytes
+        self.max_inflight_bytes = max_inflight_bytes
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+        self.buckets = OrderedDict()
+        self.active = 0
+        self.waiting = 0
+        self.inflight_bytes = 0
+        self.counts = dict.fromkeys(('admitted',) + REJECTION_REASONS, 0)
+
+    def bucket(self, client, share):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate * share, self.burst * share)
+            while len(self.buckets) > MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        self.buckets.move_to_end(client)
+        return bucket
+
+    def reject(self, reason, message, retry_after=None):
+        self.counts[reason] += 1
+        raise Rejected(reason, message, retry_after)
+
+    # Take a rate-limit token for the session and, if known, its IP address
+    def take_tokens(self, session, ip):
+        taken = []
+        for client, share in ((f"session:{session}", 1), (f"ip:{ip}", SESSIONS_PER_IP)):
+            if client == "ip:None":
+                continue
+            bucket = self.bucket(client, share)
+            wait = bucket.take()
+            if wait:
+                for earlier in taken:
+                    earlier.give_back()
+                return wait, []
+            taken.append(bucket)
+        return 0.0, taken
+
+    def has_room(self, upload_bytes):
+        return self.active < self.workers and (
+            self.inflight_bytes + upload_bytes <= self.max_inflight_bytes or self.active == 0)
+
+    # Context manager around processing one submission
+    @contextmanager
+    def admit(self, session, ip=None, upload_sizes=()):
+        upload_bytes = sum(upload_sizes)
+        with self.lock:
+            if any(size > self.max_upload_bytes for size in upload_sizes):
+                self.reject('too_large', f"Photos can be at most {self.max_upload_bytes / MB:.0f} MB. "
+                                         f"Please upload a smaller image.")
+
+            wait, tokens = self.take_tokens(session, ip)
+            if wait:
+                self.reject('rate_limited',
+                            f"You are submitting too quickly. Please retry in {math.ceil(wait)} seconds.",
+                            retry_after=wait)
+
+            if not self.has_room(upload_bytes):
+                if self.waiting >= self.queue_size:
+                    for bucket in tokens:
+                        bucket.give_back()
+                    self.reject('busy', "The system is busy right now. Please retry in a few seconds.",
+                                retry_after=self.queue_timeout)
+                self.waiting += 1
+                deadline = time.monotonic() + self.queue_timeout
+                while not self.has_room(upload_bytes):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.slot_freed.wait(remaining)
+                self.waiting -= 1
+                if not self.has_room(upload_bytes):
+                    for bucket in tokens:
+                        bucket.give_back()
+                    self.reject('busy', "The system is busy right now. Please retry in a few seconds.",
+                                retry_after=self.queue_timeout)
+
+            self.active += 1
+            self.inflight_bytes += upload_bytes
+            self.counts['admitted'] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.inflight_bytes -= upload_bytes
+                self.slot_freed.notify_all()
+
+    # Counters and current load, for the admin dashboard
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, processing=self.active, queue_depth=self.waiting,
+                        inflight_upload_mb=self.inflight_bytes / MB)
+
+
+_controller = AdmissionController()
+
+# Function to get the controller shared by every session in the process
+def shared_controller():
+    return _controller
@@ -0,0 +1,149 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Resampling rules offered on the Statistics and Reports page
+TREND_FREQUENCIES = {
+    "Daily": "D",
+    "Weekly": "W",
+    "Monthly": "MS",
+}
+
+# Function to turn a list of item records into a columnar table.
+# Only the fact columns are kept; free text and images stay in the records and
+# the 'key' column holds each item's id key, to look the item up again.
+def items_frame(items, kind):
+    return pd.DataFrame({
+        'key': [item.key for item in items],
+        'kind': [kind] * len(items),
+        'item_type': [item['item_type'] for item in items],
+        'status': [item['status'] for item in items],
+        'date_reported': pd.to_datetime([item['date_reported'] for item in items], format=DATE_FORMAT),
+        'date_returned': pd.to_datetime([item.get('date_returned') or None for item in items], format=DATE_FORMAT),
+    })
+
+# Function to pre-aggregate the item table into per-day counts
+def daily_rollup(frame):
+    return (frame.groupby(['date_reported', 'kind', 'item_type', 'status'], observed=True)
+            .size()
+            .rename('count')
+            .reset_index()
+            .sort_values('date_reported', kind='stable', ignore_index=True))
+
+# Function to get the returned lost items. Returns are counted on lost reports
+# only, like the Returned Items metric and the recovery rate, so a found report
+# of the same object doesn't count it twice.
+def returned_lost(frame):
+    return frame[(frame['kind'] == 'Lost') & (frame['status'] == 'Returned')].dropna(subset=['date_returned'])
+
+# Function to pre-aggregate returned lost items into a days-to-return histogram per day.
+# Medians are not additive, but histograms are, so any period can be answered
+# from the rollup without going back to the items.
+def returns_rollup(frame):
+    returned = returned_lost(frame)
+    days = (returned['date_returned'] - returned['date_reported']).dt.days
+    return (returned.assign(days_to_return=days)
+            .groupby(['date_reported', 'days_to_return'])
+            .size()
+            .rename('count')
+            .reset_index()
+            .sort_values('date_reported', kind='stable', ignore_index=True))
+
+# Function to pre-aggregate returned lost items into counts per day of return
+def returned_daily_rollup(frame):
+    return (returned_lost(frame).groupby('date_returned')
+            .size()
+            .rename('count')
+            .reset_index()
+            .sort_values('date_returned', kind='stable', ignore_index=True))
+
+# Function to build the columnar table and all rollups in one pass
+def build_rollups(lost_items, found_items):
+    frame = pd.concat([items_frame(lost_items, 'Lost'), items_frame(found_items, 'Found')], ignore_index=True)
+    for column in ('kind', 'item_type', 'status'):
+        frame[column] = frame[column].astype('category')
+    return {
+        'frame': frame,
+        'daily': daily_rollup(frame),
+        'returns': returns_rollup(frame),
+        'returned_daily': returned_daily_rollup(frame),
+    }
+
+# Function to cut a date-sorted rollup down to a period with a binary search
+def period_slice(rollup, start, end, date_column='date_reported'):
+    dates = rollup[date_column].to_numpy()
+    lo = dates.searchsorted(np.datetime64(start, 'ns'), side='left')
+    hi = dates.searchsorted(np.datetime64(end, 'ns'), side='right')
+    return rollup.iloc[lo:hi]
+
+# Function to compute the median of a value histogram
+def weighted_median(values, weights):
+    values = np.asarray(values)
+    weights = np.asarray(weights)
+    total = int(weights.sum())
+    if total == 0:
+        return None
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    cumulative = np.cumsum(weights[order])
+    lower = values[cumulative.searchsorted((total - 1) // 2, side='right')]
+    upper = values[cumulative.searchsorted(total // 2, side='right')]
+    return (float(lower) + float(upper)) / 2
+
+# Function to count a rollup slice by one of its columns
+def count_by(rollup, column):
+    counts = rollup.groupby(column, observed=True)['count'].sum()
+    return {key: int(value) for key, value in counts.items() if value > 0}
+
+# Function to summarise one report period from the rollups
+def period_summary(rollups, start, end):
+    daily = period_slice(rollups['daily'], start, end)
+    returns = period_slice(rollups['returns'], start, end)
+
+    lost = daily[daily['kind'] == 'Lost']
+    found = daily[daily['kind'] == 'Found']
+    total_lost = int(lost['count'].sum())
+    returned_lost = int(lost.loc[lost['status'] == 'Returned', 'count'].sum())
+
+    return {
+        'lost': total_lost,
+        'found': int(found['count'].sum()),
+        'returned': returned_lost,
+        'recovery_rate': (returned_lost / total_lost) * 100 if total_lost else 0.0,
+        'median_days_to_return': weighted_median(returns['days_to_return'], returns['count']),
+        'lost_by_type': count_by(lost, 'item_type'),
+        'found_by_type': count_by(found, 'item_type'),
+        'lost_by_status': count_by(lost, 'status'),
+        'found_by_status': count_by(found, 'status'),
+    }
+
+# Function to get the period of the same length immediately before a period
+def previous_period(start, end):
+    length = end - start
+    previous_end = start - datetime.timedelta(days=1)
+    return previous_end - length, previous_end
+
+# Function to build a Lost/Found/Returned time series for a period
+def trend(rollups, start, end, frequency="Daily"):
+    daily = period_slice(rollups['daily'], start, end)
+    returned = period_slice(rollups['returned_daily'], start, end, 'date_returned')
+    series = {
+        'Lost': daily[daily['kind'] == 'Lost'].groupby('date_reported')['count'].sum(),
+        'Found': daily[daily['kind'] == 'Found'].groupby('date_reported')['count'].sum(),
+        # Returns fall on the day the item went back, not the day it was reported
+        'Returned': returned.groupby('date_returned')['count'].sum(),
+    }
+    table = pd.DataFrame(series).reindex(pd.date_range(start, end, freq='D'), fill_value=0).fillna(0)
+    return table.resample(TREND_FREQUENCIES[frequency]).sum().astype(int)
+
+# Function to get the items of one kind reported within a period.
+# Items are looked up by key with `get_item`; any deleted since the rollups were built are left out.
+def items_in_period(rollups, get_item, kind, start, end):
+    frame = rollups['frame']
+    dates = frame['date_reported']
+    mask = (frame['kind'] == kind) & (dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))
+    items = map(get_item, frame.loc[mask, 'key'])
+    return [item for item in items if item is not None]
@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import item_store
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 500
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Pages with more items than this are streamed with chunked encoding
+STREAM_THRESHOLD = 100
+
+KINDS = ('lost', 'found')
+
+ITEM_PATH = re.compile(r"^/items/([0-9a-fA-F-]{36})$")
+CREATE_PATH = re.compile(r"^/items/(lost|found)$")
+BATCH_PATH = re.compile(r"^/items/(lost|found)/batch$")
+
+# Item fields the API never returns: photos are large, and the people who
+# reported an item and how to reach them are only shown to admins in the app
+HIDDEN_FIELDS = ('image', 'reporter_name', 'founder_name', 'contact_info', 'merged_from')
+
+# Interface the API listens on; set LOSTANDFOUND_API_HOST=0.0.0.0 to serve other machines
+DEFAULT_HOST = os.environ.get("LOSTANDFOUND_API_HOST", "127.0.0.1")
+
+
+# Error returned to the client as a JSON body with the given status code
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Function to turn an item into its API form (photos are only flagged)
+def item_to_json(kind, item):
+    data = {key: value for key, value in item.items() if key not in HIDDEN_FIELDS}
+    data['kind'] = kind
+    data['has_image'] = bool(item.get('image'))
+    return data
+
+
+# Request handler; one instance per request, the store is attached to the server
+class ApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY each
+    # kept-alive response stalls on delayed ACKs
+    disable_nagle_algorithm = True
+    server_version = "LostAndFoundAPI/1.0"
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # Responses
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    # Stream a JSON object whose last member is a (possibly long) list of items
+    def send_json_stream(self, status, head, list_name, rows):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        opening = json.dumps(head)[:-1]
+        opening += (", " if head else "") + json.dumps(list_name) + ": ["
+        buffer = [opening]
+        size = len(opening)
+        for index, row in enumerate(rows):
+            encoded = ("" if index == 0 else ", ") + json.dumps(row)
+            buffer.append(encoded)
+            size += len(encoded)
+            if size >= 64 * 1024:
+                self.send_chunk("".join(buffer).encode())
+                buffer = []
+                size = 0
+        buffer.append("]}")
+        self.send_chunk("".join(buffer).encode())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def read_json(self):
+        self.body_read = True
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.body_read = False
+            raise ApiError(413, "Request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise ApiError(400, "Request body must be valid JSON")
+
+    def check_api_key(self):
+        api_key = self.server.api_key
+        if api_key and self.headers.get("X-API-Key") != api_key:
+            raise ApiError(401, "Missing or invalid X-API-Key header")
+
+    def dispatch(self, routes):
+        path = urlsplit(self.path).path
+        self.body_read = False
+        try:
+            self.check_api_key()
+            for pattern, handler in routes:
+                match = pattern.match(path)
+                if match:
+                    handler(*match.groups())
+                    return
+            raise ApiError(404, "Not found")
+        except ApiError as error:
+            if not self.body_read and int(self.headers.get("Content-Length") or 0):
+                # An unread body would be parsed as the next request, so drop the connection
+                self.close_connection = True
+            self.send_json(error.status, {'error': error.message})
+
+    def do_GET(self):
+        self.dispatch([
+            (ITEM_PATH, self.get_item),
+            (re.compile(r"^/items$"), self.search),
+            (re.compile(r"^/health$"), self.health),
+        ])
+
+    def do_POST(self):
+        self.dispatch([
+            (CREATE_PATH, self.create_item),
+            (BATCH_PATH, self.create_batch),
+            (re.compile(r"^/claims$"), self.create_claim),
+        ])
+
+    # Endpoints
+
+    def health(self):
+        self.send_json(200, {'status': 'ok', 'version': self.store.version})
+
+    def get_item(self, item_id):
+        item = self.store.get_item(item_id)
+        if item is None:
+            raise ApiError(404, f"No item with ID {item_id}")
+        self.send_json(200, item_to_json(item.kind, item))
+
+    def search(self):
+        query = parse_qs(urlsplit(self.path).query)
+        kind = query.get('kind', ['both'])[0]
+        term = query.get('q', [''])[0]
+        item_type = query.get('type', ['All Types'])[0]
+        try:
+            offset = max(0, int(query.get('offset', ['0'])[0]))
+            limit = min(MAX_PAGE_SIZE, max(1, int(query.get('limit', [str(DEFAULT_PAGE_SIZE)])[0])))
+        except ValueError:
+            raise ApiError(400, "offset and limit must be integers")
+        if kind not in KINDS + ('both',):
+            raise ApiError(400, "kind must be lost, found or both")
+
+        kinds = KINDS if kind == 'both' else (kind,)
+        with self.store.lock:
+            matches = [(k, item) for k in kinds
+                       for item in item_store.search_items(self.store.items(k), term, item_type)]
+        page = matches[offset:offset + limit]
+        head = {'total': len(matches), 'offset': offset, 'limit': limit}
+        rows = (item_to_json(k, item) for k, item in page)
+
+        if len(page) > STREAM_THRESHOLD:
+            self.send_json_stream(200, head, 'items', rows)
+        else:
+            head['items'] = list(rows)
+            self.send_json(200, head)
+
+    def create_item(self, kind):
+        fields = self.read_json()
+        if not isinstance(fields, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        try:
+            item = item_store.new_item(kind, fields)
+        except ValueError as error:
+            raise ApiError(400, str(error))
+        self.store.add_item(kind, item)
+        self.send_json(201, item_to_json(kind, item))
+
+    # Every record is validated before any is stored, so a batch is all-or-nothing
+    def create_batch(self, kind):
+        records = self.read_json()
+        if not isinstance(records, list) or not records:
+            raise ApiError(400, "Request body must be a non-empty JSON list")
+        if len(records) > MAX_BATCH_SIZE:
+            raise ApiError(400, f"A batch can hold at most {MAX_BATCH_SIZE} items")
+
+        items = []
+        for index, fields in enumerate(records):
+            if not isinstance(fields, dict):
+                raise ApiError(400, f"Item {index}: must be a JSON object")
+            try:
+                items.append(item_store.new_item(kind, fields))
+            except ValueError as error:
+                raise ApiError(400, f"Item {index}: {error}")
+        self.store.add_items(kind, items)
+        self.send_json(201, {'items': [item_to_json(kind, item) for item in items]})
+
+    def create_claim(self):
+        fields = self.read_json()
+        if not isinstance(fields, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        missing = [name for name in ('item_id',) + item_store.CLAIM_FIELDS if not fields.get(name)]
+        if missing:
+            raise ApiError(400, f"Missing required fields: {', '.join(missing)}")
+        not_text = [name for name in ('item_id',) + item_store.CLAIM_FIELDS if not isinstance(fields[name], str)]
+        if not_text:
+            raise ApiError(400, f"Fields must be strings: {', '.join(not_text)}")
+
+        kind = self.store.get_item_kind(fields['item_id'])
+        if kind is None:
+            raise ApiError(404, f"No item with ID {fields['item_id']}")
+        claim = self.store.submit_claim(kind, fields['item_id'], fields['claimer_name'],
+                                        fields['contact_info'], fields['description'])
+        if claim is None:
+            raise ApiError(409, "Item is no longer available for claiming")
+        self.send_json(201, dict(claim))
+
+
+# Function to create (but not start) an API server bound to a store
+def make_server(store, host=DEFAULT_HOST, port=8502, api_key=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.store = store
+    server.api_key = api_key
+    server.verbose = verbose
+    return server
+
+# Function to run the API on a daemon thread next to the Streamlit app
+def serve_in_background(store, host=DEFAULT_HOST, port=8502):
+    server = make_server(store, host, port, api_key=os.environ.get("LOSTANDFOUND_API_KEY"))
+    thread = threading.Thread(target=server.serve_forever, name="lostandfound-api", daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Lost & Found JSON API on its own store")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = make_server(item_store.shared_store(), args.host, args.port,
+                         api_key=os.environ.get("LOSTANDFOUND_API_KEY"), verbose=args.verbose)
+    print(f"Serving Lost & Found API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
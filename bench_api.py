@@ -0,0 +1,111 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import item_store
+
+# Function to build a synthetic report for seeding and create requests
+def sample_fields(kind, index):
+    fields = {
+        'item_type': item_store.ITEM_TYPES[index % len(item_store.ITEM_TYPES)],
+        'item_name': f"Sample item {index}",
+        'description': f"Synthetic {kind} report number {index} for benchmarking",
+        'location': f"Gate {index % 40}",
+        'contact_info': f"user{index}@example.com",
+    }
+    if kind == 'lost':
+        fields.update(date_lost="2025-01-01", reporter_name="Bench Reporter")
+    else:
+        fields.update(date_found="2025-01-01", founder_name="Bench Founder")
+    return fields
+
+# Function to start the API in a child process pinned to a single CPU
+def start_server(port):
+    def pin_to_one_core():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    server = subprocess.Popen([sys.executable, "api.py", "--host", "127.0.0.1", "--port", str(port)],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, preexec_fn=pin_to_one_core)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("API server did not start")
+
+# Function to send a request on a kept-alive connection and check its status
+def call(connection, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    if response.status >= 300:
+        raise RuntimeError(f"{method} {path} returned {response.status}: {data[:200]!r}")
+    return data
+
+# Function to run one scenario from several client threads and return requests per second
+def run_scenario(port, clients, duration, make_request):
+    counts = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def worker(slot):
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        n = 0
+        while time.perf_counter() < stop_at:
+            make_request(connection, slot * 1_000_000 + n)
+            n += 1
+        counts[slot] = n
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API requests per second with the server on one core")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--seed-items", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    args = parser.parse_args()
+
+    server = start_server(args.port)
+    try:
+        seeder = http.client.HTTPConnection("127.0.0.1", args.port)
+        item_ids = []
+        for start in range(0, args.seed_items, 500):
+            batch = [sample_fields('found', index) for index in range(start, min(start + 500, args.seed_items))]
+            created = json.loads(call(seeder, "POST", "/items/found/batch", batch))
+            item_ids.extend(item['id'] for item in created['items'])
+        seeder.close()
+
+        scenarios = [
+            ("get by id", lambda c, n: call(c, "GET", f"/items/{item_ids[n % len(item_ids)]}")),
+            ("create lost item", lambda c, n: call(c, "POST", "/items/lost", sample_fields('lost', n))),
+            ("search page of 20", lambda c, n: call(c, "GET", f"/items?kind=found&q=gate+{n % 40}&limit=20")),
+            ("search page of 500 (streamed)", lambda c, n: call(c, "GET", "/items?kind=found&limit=500")),
+        ]
+        print(f"{args.seed_items} seeded items, {args.clients} keep-alive clients, server pinned to one core")
+        for name, make_request in scenarios:
+            rate = run_scenario(args.port, args.clients, args.duration, make_request)
+            print(f"{name:<32} {rate:10.0f} req/s")
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,62 @@
+import argparse
+import datetime
+import gc
+import tracemalloc
+import uuid
+
+import item_store
+from bench_api import sample_fields
+
+
+# Function to build a report's fields the way a form submission delivers them:
+# every text value, dates included, is a separate string object
+def submitted_fields(kind, index):
+    fields = {name: "".join(value) for name, value in sample_fields(kind, index).items()}
+    day = (datetime.date(2025, 1, 1) + datetime.timedelta(days=index % 365)).strftime(item_store.DATE_FORMAT)
+    fields['date_lost' if kind == 'lost' else 'date_found'] = day
+    return fields
+
+# Function to build an item as a plain dict, the representation used before records
+def dict_item(kind, fields):
+    item = {'id': str(uuid.uuid4())}
+    for name in item_store.REQUIRED_FIELDS[kind]:
+        item[name] = fields[name]
+    item['status'] = 'Open'
+    item['date_reported'] = item_store.today()
+    item['image'] = ""
+    return item
+
+# Function to measure live bytes per item for the list and id index a store keeps
+def bytes_per_item(count, build):
+    gc.collect()
+    tracemalloc.start()
+    items, by_id = [], {}
+    for index in range(count):
+        build(items, by_id, 'lost', submitted_fields('lost', index))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items, by_id
+    gc.collect()
+    return size / count
+
+def build_dicts(items, by_id, kind, fields):
+    item = dict_item(kind, fields)
+    items.append(item)
+    by_id[item['id']] = (kind, item)
+
+def build_records(items, by_id, kind, fields):
+    item = item_store.new_item(kind, fields)
+    items.append(item)
+    by_id[item.key] = item
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory per item for dict items and slotted records")
+    parser.add_argument("--counts", default="100000,1000000", help="comma-separated item counts")
+    args = parser.parse_args()
+
+    print(f"{'items':>10}{'dict B/item':>14}{'record B/item':>16}{'saved':>8}")
+    for count in [int(value) for value in args.counts.split(",")]:
+        dicts = bytes_per_item(count, build_dicts)
+        records = bytes_per_item(count, build_records)
+        print(f"{count:>10}{dicts:>14.0f}{records:>16.0f}{1 - records / dicts:>8.0%}")
@@ -0,0 +1,153 @@
+import html
+import threading
+from collections import OrderedDict
+
+# Card bodies kept in memory; photos are never part of a card's HTML
+CACHE_SIZE = 10000
+# Checked photos kept in memory; far fewer, as each one can be megabytes
+PHOTO_CACHE_SIZE = 200
+
+_cache = OrderedDict()
+_photos = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+# Function to make user text safe to place inside card HTML.
+# Newlines become <br> so a blank line can't end the HTML block early.
+def text(value):
+    return html.escape(str(value)).replace("\n", "<br>")
+
+
+# Function to build the body of a lost or found item card
+def item_body_html(kind, item, variant):
+    verb, date_field = ("Lost", 'date_lost') if kind == 'lost' else ("Found", 'date_found')
+
+    if variant == 'admin':
+        person_label, person_field = ("Reporter", 'reporter_name') if kind == 'lost' else ("Founder", 'founder_name')
+        return (
+            f"<b>ID:</b> {text(item['id'])}<br>"
+            f"<b>Item:</b> {text(item['item_name'])} ({text(item['item_type'])})<br>"
+            f"<b>Status:</b> {text(item['status'])}<br>"
+            f"<b>{person_label}:</b> {text(item[person_field])} - {text(item['contact_info'])}<br>"
+            f"<b>Details:</b> {verb} on {text(item[date_field])} at {text(item['location'])}<br>"
+            f"<b>Description:</b> {text(item['description'])}"
+            + "".join(f"<br><b>Merged report:</b> {text(merged['name'])} - {text(merged['contact_info'])} "
+                      f"<small>(ID: {text(merged['id'])})</small>" for merged in item.get('merged_from', ()))
+        )
+
+    return (
+        f"<b>{text(item['item_name'])}</b> ({text(item['item_type'])}) - {text(item['status'])}<br>"
+        f"<i>{verb} on {text(item[date_field])} at {text(item['location'])}</i><br>"
+        f"<small>Description: {text(item['description'])}</small><br>"
+        f"<small>Reference ID: {text(item['id'])}</small>"
+    )
+
+# Function to build the body of a claim card
+def claim_body_html(claim):
+    return (
+        f"<b>Claim ID:</b> {text(claim['id'])}<br>"
+        f"<b>Item ID:</b> {text(claim['item_id'])} ({text(claim['item_type'])} Item)<br>"
+        f"<b>Status:</b> {text(claim['status'])}<br>"
+        f"<b>Claimer:</b> {text(claim['claimer_name'])} - {text(claim['contact_info'])}<br>"
+        f"<b>Date Claimed:</b> {text(claim['date_claimed'])}<br>"
+        f"<b>Proof/Description:</b> {text(claim['description'])}"
+    )
+
+
+# Function to look up a rendered body, building and caching it on a miss.
+# Keys carry the record's revision, so an edited record simply misses.
+def cached_body(key, build):
+    with _cache_lock:
+        body = _cache.get(key)
+        if body is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return body
+        _stats['misses'] += 1
+
+    body = build()
+    with _cache_lock:
+        _cache[key] = body
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return body
+
+# Function to look up a checked photo, loading and caching it on a miss.
+# Like card bodies, photos are keyed by the record's revision; an unreadable
+# photo is cached as None so it isn't checked again.
+def cached_photo(key, load):
+    with _cache_lock:
+        if key in _photos:
+            _photos.move_to_end(key)
+            return _photos[key]
+
+    photo = load()
+    with _cache_lock:
+        _photos[key] = photo
+        while len(_photos) > PHOTO_CACHE_SIZE:
+            _photos.popitem(last=False)
+    return photo
+
+# Function to get cache size and hit/miss counts
+def cache_info():
+    with _cache_lock:
+        return {'size': len(_cache), 'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+# Function to get an item card's body from the cache
+def item_body(kind, item, revision, variant='summary'):
+    return cached_body((item['id'], revision, variant), lambda: item_body_html(kind, item, variant))
+
+# Function to render a full item card without its photo; `extra` is appended uncached
+def item_card(kind, item, revision, variant='summary', extra=""):
+    return "".join(("<div class='card'>", item_body(kind, item, revision, variant), extra, "</div>"))
+
+# Function to render a full claim card
+def claim_card(claim, revision):
+    body = cached_body((claim['id'], revision, 'claim'), lambda: claim_body_html(claim))
+    return "".join(("<div class='card'>", body, "</div>"))
+
+# Function to render a small statistic card
+def stat_card(title, value):
+    return (f"<div class='card'><div class='section-header'>{text(title)}</div>"
+            f"<div style='font-size: 24px; text-align: center;'>{text(value)}</div></div>")
+
+# Bar colours for the status charts
+STATUS_COLORS = {
+    'Returned': '#4CAF50',  # Green
+    'Open': '#FFC107',  # Yellow
+    'Claimed': '#2196F3',  # Blue
+}
+DEFAULT_STATUS_COLOR = '#9E9E9E'  # Grey
+
+# Function to render a card with a simple HTML/CSS bar chart, largest bar first.
+# Without a colour, bars are coloured by status.
+def bar_chart_card(title, counts, total, color=None):
+    rows = []
+    for label, count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
+        # Calculate percentage of total
+        percentage = (count / total) * 100 if total else 0
+        bar_color = color or STATUS_COLORS.get(label, DEFAULT_STATUS_COLOR)
+        rows.append(
+            f"<div style='margin-bottom: 8px;'><div style='display: flex; align-items: center;'>"
+            f"<div style='width: 100px; font-weight: bold;'>{text(label)}</div>"
+            f"<div style='flex-grow: 1; margin: 0 10px;'>"
+            f"<div style='background-color: #f0f2f6; border-radius: 4px; height: 24px; width: 100%;'>"
+            f"<div style='background-color: {bar_color}; border-radius: 4px; height: 24px; width: {percentage}%'></div>"
+            f"</div></div>"
+            f"<div style='width: 50px; text-align: right;'>{count}</div>"
+            f"</div></div>"
+        )
+    return f"<div class='card'><div class='section-header'>{text(title)}</div>{''.join(rows)}</div>"
+
+# Function to render the list of similar items shown inside a card
+def similar_items_html(matches, heading):
+    if not matches:
+        return ""
+    rows = "".join(
+        f"<li>{text(item['item_name'])} ({text(item['item_type'])}) - {text(item['status'])}, {text(item['location'])} "
+        f"<small>[ID: {text(item['id'])}, {score:.0%} match]</small></li>"
+        for item, score in matches
+    )
+    return f"<div style='margin-top: 8px;'><b>{text(heading)}</b><ul>{rows}</ul></div>"
@@ -0,0 +1,98 @@
+import zlib
+
+import numpy as np
+
+from similarity import tokenize
+
+# 16 bands of 4 rows put the LSH threshold near a Jaccard similarity of
+# (1/16) ** (1/4) = 0.5: pairs above it almost always share a bucket,
+# pairs well below it rarely do
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# Estimated Jaccard similarity from which two reports count as duplicates
+DUPLICATE_THRESHOLD = 0.5
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20250101)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+# Function to turn a report into the set of features two duplicates would share:
+# words and word pairs from the name and description, the location words and the date
+def shingles(item, date_field):
+    words = tokenize(f"{item['item_name']} {item['description']}")
+    features = set(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    features.update(f"at:{word}" for word in tokenize(item['location']))
+    features.add(f"on:{item[date_field]}")
+    return features
+
+# Function to compute the MinHash signature of a set of shingles
+def minhash(features):
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint64,
+                         count=len(features))
+    if not len(hashes):
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    # (a * x + b) mod p for every permutation and shingle; values stay below 2 ** 63
+    return ((_A[:, None] * (hashes[None, :] & _PRIME) + _B[:, None]) % _PRIME).min(axis=1)
+
+# Function to estimate the Jaccard similarity of two signatures
+def estimated_similarity(first, second):
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+# Locality-sensitive hashing index over MinHash signatures.
+# Each signature is cut into bands and every band is hashed into a bucket, so a
+# lookup only compares against reports that share at least one bucket.
+class DuplicateIndex:
+    def __init__(self, date_field):
+        self.date_field = date_field
+        self.signatures = {}
+        self.buckets = [{} for _ in range(NUM_BANDS)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    @staticmethod
+    def band_keys(signature):
+        return [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes() for band in range(NUM_BANDS)]
+
+    def signature(self, item):
+        return minhash(shingles(item, self.date_field))
+
+    def add(self, doc_id, item):
+        if doc_id in self.signatures:
+            self.remove(doc_id)
+        signature = self.signature(item)
+        self.signatures[doc_id] = signature
+        for band, key in enumerate(self.band_keys(signature)):
+            self.buckets[band].setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        signature = self.signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self.band_keys(signature)):
+            bucket = self.buckets[band][key]
+            bucket.discard(doc_id)
+            if not bucket:
+                del self.buckets[band][key]
+
+    # Reports that look like duplicates of the item, most similar first
+    def query(self, item, threshold=DUPLICATE_THRESHOLD, exclude=None):
+        signature = self.signature(item)
+        candidates = set()
+        for band, key in enumerate(self.band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        candidates.discard(exclude)
+
+        matches = []
+        for doc_id in candidates:
+            score = estimated_similarity(signature, self.signatures[doc_id])
+            if score >= threshold:
+                matches.append((doc_id, score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
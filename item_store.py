@@ -0,0 +1,508 @@
+import base64
+import binascii
+import datetime
+import threading
+import uuid
+
+import records
+from dedup import DuplicateIndex
+from records import uuid_key
+from similarity import SimilarityIndex
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Parts of the store that carry their own version, so a cache over one isn't
+# thrown away by writes to another
+PARTITIONS = ('lost', 'found', 'claims')
+
+ITEM_TYPES = [item_type.value for item_type in records.ItemType]
+
+# Fields a caller has to supply for each kind of report
+REQUIRED_FIELDS = {
+    'lost': ('item_type', 'item_name', 'description', 'location', 'date_lost', 'reporter_name', 'contact_info'),
+    'found': ('item_type', 'item_name', 'description', 'location', 'date_found', 'founder_name', 'contact_info'),
+}
+
+CLAIM_FIELDS = ('claimer_name', 'contact_info', 'description')
+
+# Function to get today's date in the storage format
+def today():
+    return datetime.datetime.now().strftime(DATE_FORMAT)
+
+# Function to build a new item record, raising ValueError on bad input
+def new_item(kind, fields):
+    if kind not in REQUIRED_FIELDS:
+        raise ValueError(f"Unknown item kind: {kind}")
+
+    missing = [name for name in REQUIRED_FIELDS[kind] if not fields.get(name)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    not_text = [name for name in REQUIRED_FIELDS[kind] + ('image',) if not isinstance(fields.get(name, ""), str)]
+    if not_text:
+        raise ValueError(f"Fields must be strings: {', '.join(not_text)}")
+    if fields['item_type'] not in ITEM_TYPES:
+        raise ValueError(f"Unknown item type: {fields['item_type']}")
+
+    date_field = 'date_lost' if kind == 'lost' else 'date_found'
+    try:
+        datetime.datetime.strptime(fields[date_field], DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"{date_field} must be a date in YYYY-MM-DD format")
+
+    item = records.ITEM_RECORDS[kind](id=str(uuid.uuid4()))
+    for name in REQUIRED_FIELDS[kind]:
+        item[name] = fields[name]
+    item['status'] = 'Open'
+    item['date_reported'] = today()
+    item['image'] = fields.get('image') or ""
+    if item['image']:
+        try:
+            base64.b64decode(item['image'], validate=True)
+        except binascii.Error:
+            raise ValueError("image must be base64-encoded")
+    return item
+
+# Function to get the text an item is compared on for similarity
+def item_text(item):
+    return f"{item['item_name']} {item['description']}"
+
+# Function to search items by keyword (name, description, location) and type
+def search_items(items, term, item_type):
+    results = []
+    term = term.lower()
+
+    for item in items:
+        # Check if search term exists in name, description or location
+        name_match = term in item.get('item_name', '').lower()
+        desc_match = term in item.get('description', '').lower()
+        loc_match = term in item.get('location', '').lower()
+
+        # Check if item type matches
+        type_match = item_type == "All Types" or item.get('item_type') == item_type
+
+        if (name_match or desc_match or loc_match) and type_match:
+            results.append(item)
+
+    return results
+
+
+# Process-wide store of items and claims.
+# Every Streamlit session and the HTTP API share one instance, so all writes go
+# through the methods below, which take the lock and bump the version counter.
+class ItemStore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.lost_items = []
+        self.found_items = []
+        self.claims = []
+        self.version = 0
+        self.versions = dict.fromkeys(PARTITIONS, 0)
+        # Records by their 16-byte id key; the indexes use the same keys
+        self._items_by_id = {}
+        self._claims_by_id = {}
+        self._revisions = {}
+        # Source of revisions; never reset, so no revision is handed out twice
+        self._last_revision = 0
+        self.similarity = {'lost': SimilarityIndex(), 'found': SimilarityIndex()}
+        self.duplicates = {'lost': DuplicateIndex('date_lost'), 'found': DuplicateIndex('date_found')}
+        # Keys written since the last snapshot; None until snapshots start journaling
+        self.changed_ids = None
+        # Index updates made while a rebuild is running, replayed onto the new indexes
+        self._index_log = None
+        self._rebuild_lock = threading.Lock()
+        # Bumped by clear(); a rebuild started before then is thrown away
+        self._generation = 0
+        # Records deleted since the last compaction
+        self.removed = 0
+
+    def items(self, kind):
+        return self.lost_items if kind == 'lost' else self.found_items
+
+    # Bump the store version and those of the partitions written; all of them if none are named
+    def _changed(self, *partitions):
+        self.version += 1
+        for partition in partitions or PARTITIONS:
+            self.versions[partition] += 1
+
+    # Revision of a record's last write, so caches of a single item or claim know when
+    # it changed. Revisions come from one store-wide counter, so a record deleted and
+    # written again, or restored from a snapshot, never gets a revision it had before.
+    def revision(self, record_id):
+        return self._revisions.get(uuid_key(record_id), 0)
+
+    def _new_revision(self, key):
+        self._last_revision += 1
+        self._revisions[key] = self._last_revision
+
+    def _touch(self, key):
+        self._new_revision(key)
+        self._journal(key)
+
+    # Change journal for incremental snapshots
+
+    def _journal(self, key):
+        if self.changed_ids is not None:
+            self.changed_ids.add(key)
+
+    def start_journal(self):
+        with self.lock:
+            if self.changed_ids is None:
+                self.changed_ids = set()
+
+    # Keys of records added, edited or deleted since the last call
+    def take_changes(self):
+        with self.lock:
+            changes, self.changed_ids = self.changed_ids or set(), set()
+            return changes
+
+    # Put keys back into the journal, e.g. after a snapshot failed to write
+    def mark_changed(self, keys):
+        with self.lock:
+            self.start_journal()
+            self.changed_ids.update(keys)
+
+    # Search and duplicate indexes
+
+    def _index(self, kind, item):
+        self.similarity[kind].add(item.key, item_text(item))
+        self.duplicates[kind].add(item.key, item)
+        if self._index_log is not None:
+            self._index_log.append((kind, item.key))
+
+    def _unindex(self, kind, key):
+        self.similarity[kind].remove(key)
+        self.duplicates[kind].remove(key)
+        if self._index_log is not None:
+            self._index_log.append((kind, key))
+
+    # Rebuild both indexes from scratch without holding the lock for the whole
+    # build. Writes made meanwhile are logged and replayed before the swap.
+    def rebuild_indexes(self):
+        with self._rebuild_lock:
+            with self.lock:
+                items = {kind: list(self.items(kind)) for kind in ('lost', 'found')}
+                generation = self._generation
+                self._index_log = []
+
+            similarity = {'lost': SimilarityIndex(), 'found': SimilarityIndex()}
+            duplicates = {'lost': DuplicateIndex('date_lost'), 'found': DuplicateIndex('date_found')}
+            for kind, kind_items in items.items():
+                for item in kind_items:
+                    similarity[kind].add(item.key, item_text(item))
+                    duplicates[kind].add(item.key, item)
+
+            with self.lock:
+                if self._generation != generation:
+                    self._index_log = None
+                    return
+                for kind, key in self._index_log:
+                    item = self._items_by_id.get(key)
+                    if item is not None and item.kind == kind:
+                        similarity[kind].add(key, item_text(item))
+                        duplicates[kind].add(key, item)
+                    else:
+                        similarity[kind].remove(key)
+                        duplicates[kind].remove(key)
+                self.similarity, self.duplicates = similarity, duplicates
+                self._index_log = None
+                self._changed()
+
+    # Give back the space deleted records leave in the id maps and indexes:
+    # dicts never shrink, so copy the maps and rebuild the indexes
+    def compact(self):
+        with self.lock:
+            self._items_by_id = dict(self._items_by_id)
+            self._claims_by_id = dict(self._claims_by_id)
+            self._revisions = dict(self._revisions)
+            self.removed = 0
+        self.rebuild_indexes()
+
+    # Drop every item and claim, e.g. before restoring a snapshot. Starts a new
+    # index generation, so a rebuild of the old contents still running is discarded.
+    def clear(self):
+        with self.lock:
+            self.lost_items.clear()
+            self.found_items.clear()
+            self.claims.clear()
+            self._items_by_id.clear()
+            self._claims_by_id.clear()
+            self._revisions.clear()
+            self.similarity = {'lost': SimilarityIndex(), 'found': SimilarityIndex()}
+            self.duplicates = {'lost': DuplicateIndex('date_lost'), 'found': DuplicateIndex('date_found')}
+            self._generation += 1
+            if self.changed_ids is not None:
+                self.changed_ids = set()
+            self.removed = 0
+            self._changed()
+
+    # Items
+
+    # Look up by id string or 16-byte key
+    def get_item(self, item_id):
+        return self._items_by_id.get(uuid_key(item_id))
+
+    def get_item_kind(self, item_id):
+        item = self.get_item(item_id)
+        return item.kind if item is not None else None
+
+    def add_item(self, kind, item):
+        return self.add_items(kind, [item])[0]
+
+    # Bulk loads can skip indexing and call rebuild_indexes() once afterwards.
+    # Items are indexed before they are stored, so an item that fails to index
+    # leaves the store as it was.
+    def add_items(self, kind, items, index=True):
+        with self.lock:
+            if index:
+                indexed = []
+                try:
+                    for item in items:
+                        self._index(kind, item)
+                        indexed.append(item.key)
+                except Exception:
+                    for key in indexed + [item.key]:
+                        self._unindex(kind, key)
+                    raise
+            kind_items = self.items(kind)
+            for item in items:
+                kind_items.append(item)
+                self._items_by_id[item.key] = item
+                self._touch(item.key)
+            self._changed(kind)
+        return items
+
+    # Insert items or overwrite the stored copies in place, keyed by id.
+    # Like add_items, it can skip indexing for a rebuild_indexes() afterwards.
+    def put_items(self, kind, items, index=True):
+        with self.lock:
+            new_items = []
+            written = {kind}
+            for item in items:
+                current = self._items_by_id.get(item.key)
+                if current is None:
+                    new_items.append(item)
+                    continue
+                if current.kind != kind:
+                    self._remove_item(current.kind, current)
+                    written.add(current.kind)
+                    new_items.append(item)
+                    continue
+                current.assign(item)
+                if index:
+                    self._index(kind, current)
+                self._touch(item.key)
+            self.add_items(kind, new_items, index)
+            self._changed(*written)
+
+    def set_item_status(self, kind, item_id, status):
+        changed = self.set_items_status(kind, [item_id], status)
+        return changed[0] if changed else None
+
+    # Set the status of many items of one kind in one write; returns the items changed
+    def set_items_status(self, kind, item_ids, status):
+        with self.lock:
+            changed = []
+            for item_id in item_ids:
+                item = self.get_item(item_id)
+                if item is None or item.kind != kind:
+                    continue
+                item['status'] = status
+                if status == 'Returned':
+                    item['date_returned'] = today()
+                else:
+                    item.pop('date_returned', None)
+                self._touch(item.key)
+                changed.append(item)
+            if changed:
+                self._changed(kind)
+            return changed
+
+    def delete_item(self, kind, item_id):
+        return self.delete_items(kind, [item_id]) == 1
+
+    # Delete many items of one kind in one write; returns how many were deleted
+    def delete_items(self, kind, item_ids):
+        with self.lock:
+            doomed = {}
+            for item_id in item_ids:
+                item = self.get_item(item_id)
+                if item is not None and item.kind == kind:
+                    doomed[item.key] = item
+            if doomed:
+                self._remove_items(kind, doomed)
+                self._changed(kind)
+            return len(doomed)
+
+    def _remove_item(self, kind, item):
+        self._remove_items(kind, {item.key: item})
+
+    # Drop items ({key: item}) from the list, the id map and the indexes in one pass over the list
+    def _remove_items(self, kind, doomed):
+        kind_items = self.items(kind)
+        kind_items[:] = [item for item in kind_items if item.key not in doomed]
+        for key in doomed:
+            del self._items_by_id[key]
+            self._revisions.pop(key, None)
+            self._journal(key)
+            self._unindex(kind, key)
+        self.removed += len(doomed)
+
+    # Fold a duplicate report into the one being kept: its claims move over, a
+    # missing photo is taken from it, and its reporter is listed under merged_from
+    def merge_items(self, kind, keep_id, duplicate_id):
+        with self.lock:
+            keep = self.get_item(keep_id)
+            duplicate = self.get_item(duplicate_id)
+            if (keep is None or duplicate is None or keep_id == duplicate_id
+                    or self.get_item_kind(keep_id) != kind or self.get_item_kind(duplicate_id) != kind):
+                return None
+
+            for claim in self.claims:
+                if claim.item_key == duplicate.key:
+                    claim['item_id'] = keep_id
+                    self._touch(claim.key)
+            if not keep['image'] and duplicate['image']:
+                keep['image'] = duplicate['image']
+            keep.setdefault('merged_from', []).append({
+                'id': duplicate_id,
+                'name': duplicate['reporter_name'] if kind == 'lost' else duplicate['founder_name'],
+                'contact_info': duplicate['contact_info'],
+            })
+
+            self._remove_item(kind, duplicate)
+            self._touch(keep.key)
+            self._changed(kind, 'claims')
+            return keep
+
+    # Reports of one kind that look like duplicates of the item, with estimated similarity
+    def find_duplicates(self, kind, item, exclude=None):
+        with self.lock:
+            matches = self.duplicates[kind].query(item, exclude=uuid_key(exclude))
+            return [(self._items_by_id[key], score) for key, score in matches]
+
+    # Items of one kind whose name and description best match the text, with scores
+    def similar_items(self, kind, text, k=5, exclude=None, min_score=0.1):
+        with self.lock:
+            matches = self.similarity[kind].query(text, k, uuid_key(exclude), min_score)
+            return [(self._items_by_id[key], score) for key, score in matches]
+
+    # Claims
+
+    def get_claim(self, claim_id):
+        return self._claims_by_id.get(uuid_key(claim_id))
+
+    # Claim an open item; returns the new claim, or None if the item can't be claimed
+    def submit_claim(self, kind, item_id, claimer_name, contact_info, description):
+        with self.lock:
+            item = self.get_item(item_id)
+            if item is None or self.get_item_kind(item_id) != kind or item['status'] != 'Open':
+                return None
+
+            new_claim = records.Claim(
+                id=str(uuid.uuid4()),
+                item_id=item_id,
+                item_type='Lost' if kind == 'lost' else 'Found',
+                claimer_name=claimer_name,
+                contact_info=contact_info,
+                description=description,
+                date_claimed=today(),
+                status='Pending'
+            )
+            item['status'] = 'Claimed'
+            self._touch(item.key)
+            self.claims.append(new_claim)
+            self._claims_by_id[new_claim.key] = new_claim
+            self._touch(new_claim.key)
+            self._changed(kind, 'claims')
+            return new_claim
+
+    # Insert claims or overwrite the stored copies in place, keyed by id
+    def put_claims(self, claims):
+        with self.lock:
+            for claim in claims:
+                current = self._claims_by_id.get(claim.key)
+                if current is None:
+                    self.claims.append(claim)
+                    self._claims_by_id[claim.key] = claim
+                    self._touch(claim.key)
+                else:
+                    current.assign(claim)
+                    self._touch(claim.key)
+            self._changed('claims')
+
+    # Approve or reject a claim, moving the claimed item to Returned or back to Open
+    def set_claim_status(self, claim_id, status):
+        changed = self.set_claims_status([claim_id], status)
+        return changed[0] if changed else None
+
+    # Approve or reject many claims in one write, updating each claimed item too
+    def set_claims_status(self, claim_ids, status):
+        with self.lock:
+            changed = []
+            written = {'claims'}
+            for claim_id in claim_ids:
+                claim = self.get_claim(claim_id)
+                if claim is None:
+                    continue
+                claim['status'] = status
+                self._touch(claim.key)
+                changed.append(claim)
+
+                item = self._items_by_id.get(claim.item_key)
+                if item is not None:
+                    if status == 'Approved':
+                        item['status'] = 'Returned'
+                        item['date_returned'] = today()
+                    elif status == 'Rejected':
+                        item['status'] = 'Open'
+                        item.pop('date_returned', None)
+                    self._touch(item.key)
+                    written.add(item.kind)
+            if changed:
+                self._changed(*written)
+            return changed
+
+    def delete_claim(self, claim_id):
+        return self.delete_claims([claim_id]) == 1
+
+    # Delete many claims in one write; returns how many were deleted
+    def delete_claims(self, claim_ids):
+        with self.lock:
+            doomed = set()
+            for claim_id in claim_ids:
+                claim = self.get_claim(claim_id)
+                if claim is not None:
+                    doomed.add(claim.key)
+            if doomed:
+                self.claims[:] = [claim for claim in self.claims if claim.key not in doomed]
+                for key in doomed:
+                    del self._claims_by_id[key]
+                    self._revisions.pop(key, None)
+                    self._journal(key)
+                self.removed += len(doomed)
+                self._changed('claims')
+            return len(doomed)
+
+    # Delete items or claims by id, whichever each id belongs to
+    def remove_records(self, record_ids):
+        with self.lock:
+            doomed = {'lost': {}, 'found': {}}
+            claim_ids = []
+            for record_id in record_ids:
+                item = self.get_item(record_id)
+                if item is not None:
+                    doomed[item.kind][item.key] = item
+                else:
+                    claim_ids.append(record_id)
+            for kind, items in doomed.items():
+                if items:
+                    self._remove_items(kind, items)
+            self.delete_claims(claim_ids)
+            self._changed('claims', *(kind for kind, items in doomed.items() if items))
+
+
+_shared_store = ItemStore()
+
+# Function to get the store shared by the whole process
+def shared_store():
+    return _shared_store
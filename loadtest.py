@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Simulated sessions submit far faster than people; don't let the rate limit skew the measurement.
+# The server is started with this environment, so these reach its admission control.
+os.environ.setdefault("LOSTANDFOUND_SUBMISSIONS_PER_MINUTE", "1000000")
+os.environ.setdefault("LOSTANDFOUND_SUBMISSION_BURST", "1000000")
+
+import pyarrow
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+import item_store
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lostandfound.py")
+ADMIN_PASSWORD = "admin123"
+# Seconds to wait for the server to come up
+STARTUP_TIMEOUT = 60
+# The API takes at most this many items per batch
+SEED_BATCH = 500
+
+ADJECTIVES = ["black", "blue", "red", "silver", "small", "large", "leather", "old", "new", "striped"]
+NOUNS = {
+    "Electronics": ["phone", "laptop", "charger", "headphones", "tablet"],
+    "Clothing": ["jacket", "scarf", "hat", "gloves", "sweater"],
+    "Documents": ["passport", "ID card", "folder", "notebook", "ticket"],
+    "Keys": ["car keys", "house keys", "key ring", "bike key", "locker key"],
+    "Bags": ["backpack", "handbag", "suitcase", "tote bag", "wallet"],
+    "Jewelry": ["ring", "necklace", "bracelet", "watch", "earrings"],
+    "Other": ["umbrella", "water bottle", "book", "toy", "sunglasses"],
+}
+LOCATIONS = ["Library", "Cafeteria", "Main Hall", "Gym", "Parking Lot", "Bus Stop", "Lobby", "Gate 3"]
+
+
+# Function to build one random report in the same shape as the forms produce
+def synthetic_fields(kind, rng):
+    item_type = rng.choice(item_store.ITEM_TYPES)
+    name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS[item_type])}"
+    day = (datetime.date.today() - datetime.timedelta(days=rng.randint(0, 60))).strftime(item_store.DATE_FORMAT)
+    fields = {
+        'item_type': item_type,
+        'item_name': name.capitalize(),
+        'description': f"{name} with a {rng.choice(ADJECTIVES)} tag, last seen near the {rng.choice(LOCATIONS).lower()}",
+        'location': rng.choice(LOCATIONS),
+        'contact_info': f"user{rng.randint(1, 99999)}@example.com",
+    }
+    if kind == 'lost':
+        fields.update(date_lost=day, reporter_name="Load Test")
+    else:
+        fields.update(date_found=day, founder_name="Load Test")
+    return fields
+
+
+# Function to call the app's JSON API and decode the reply
+def call_api(url, data=None):
+    request = urllib.request.Request(url, data=json.dumps(data).encode() if data is not None else None,
+                                     headers={'Content-Type': 'application/json'})
+    if os.environ.get("LOSTANDFOUND_API_KEY"):
+        request.add_header('X-API-Key', os.environ["LOSTANDFOUND_API_KEY"])
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.load(response)
+
+# Function to fill the running app with a synthetic dataset through its API; returns the found item ids
+def seed_server(api_url, count, rng):
+    found_ids = []
+    for kind in ('lost', 'found'):
+        for start in range(0, count, SEED_BATCH):
+            batch = [synthetic_fields(kind, rng) for _ in range(min(SEED_BATCH, count - start))]
+            reply = call_api(f"{api_url}/items/{kind}/batch", batch)
+            if kind == 'found':
+                found_ids.extend(item['id'] for item in reply['items'])
+    return found_ids
+
+# Function to wait until a URL answers, or give up after STARTUP_TIMEOUT seconds
+def wait_for(url, server):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+    raise RuntimeError(f"No answer from {url} after {STARTUP_TIMEOUT}s")
+
+# Function to start the app under `streamlit run`, with its JSON API on `api_port`
+def start_server(port, api_port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless=true", f"--server.port={port}",
+         "--server.fileWatcherType=none", "--browser.gatherUsageStats=false"],
+        env=dict(os.environ, LOSTANDFOUND_API_PORT=str(api_port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for(f"http://localhost:{port}/_stcore/health", server)
+    return server
+
+# Function to get the peak resident set size of a process in megabytes (Linux only; None elsewhere)
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# One headless browser session. It speaks the frontend's websocket protocol to a
+# real server, so concurrent sessions queue for the server exactly as browsers do.
+# Every rerun is timed from request to script_finished, under the page it belongs to.
+class Session:
+    def __init__(self, url, rng, timings, timeout, found_ids):
+        self.url = url
+        self.rng = rng
+        self.timings = timings
+        self.timeout = timeout
+        self.found_ids = found_ids
+        self.page = "Home"
+        # Widget values sent with every rerun, as the frontend does
+        self.values = {}
+        # Widgets and tables from the latest run, by label and by key
+        self.widgets = {}
+        self.tables = {}
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.url, max_size=None, subprotocols=["streamlit"])
+
+    async def close(self):
+        await self.websocket.close()
+
+    async def exchange(self, message):
+        await self.websocket.send(message.SerializeToString())
+        widgets, tables, exception = {}, {}, None
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await self.websocket.recv())
+            kind = reply.WhichOneof('type')
+            if kind == 'script_finished':
+                break
+            if kind != 'delta' or reply.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = reply.delta.new_element
+            element_type = element.WhichOneof('type')
+            proto = getattr(element, element_type)
+            if element_type == 'exception':
+                exception = exception or proto.message
+            elif getattr(proto, 'id', ""):
+                key = proto.id.split("-", 2)[-1]
+                if key != "None":
+                    widgets[key] = proto
+                if getattr(proto, 'label', ""):
+                    widgets.setdefault(proto.label, proto)
+                if element_type == 'dataframe' and proto.arrow_data.data:
+                    tables[key] = proto.arrow_data.data
+        return widgets, tables, exception
+
+    async def run(self, *triggers):
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.widget_states.widgets.extend(list(self.values.values()) + list(triggers))
+        started = time.perf_counter()
+        self.widgets, self.tables, exception = await asyncio.wait_for(self.exchange(message), self.timeout)
+        elapsed = time.perf_counter() - started
+        if exception:
+            raise RuntimeError(f"{self.page}: {exception}")
+        self.timings.setdefault(self.page, []).append(elapsed)
+
+    def set(self, label, value):
+        self.values[self.widgets[label].id] = WidgetState(id=self.widgets[label].id, string_value=value)
+
+    def click(self, label):
+        return WidgetState(id=self.widgets[label].id, trigger_value=True)
+
+    async def open(self, page):
+        self.page = page
+        self.set("page", page)
+        await self.run()
+
+    # Flows
+
+    async def report(self):
+        kind = self.rng.choice(('lost', 'found'))
+        fields = synthetic_fields(kind, self.rng)
+        await self.open("Report Lost Item" if kind == 'lost' else "Report Found Item")
+        self.set("Item Type*", fields['item_type'])
+        self.set("Item Name*", fields['item_name'])
+        self.set("Description*", fields['description'])
+        self.set("Last Seen Location*" if kind == 'lost' else "Found Location*", fields['location'])
+        self.set("Your Name*", "Load Test")
+        self.set("Contact Information (Phone/Email)*", fields['contact_info'])
+        await self.run(self.click("Submit Report"))
+
+    async def search(self):
+        await self.open("Search Items")
+        self.set("Search For:", self.rng.choice(["Lost Items", "Found Items", "Both"]))
+        self.set("Search by keyword (name, description, location)",
+                 self.rng.choice(NOUNS[self.rng.choice(item_store.ITEM_TYPES)]))
+        await self.run(self.click("Search"))
+
+    async def claim(self):
+        await self.open("Claim Item")
+        self.set("Type of Item to Claim", "Lost")
+        self.set("Item Reference ID*", self.rng.choice(self.found_ids))
+        self.set("Your Name*", "Load Test")
+        self.set("Contact Information (Phone/Email)*", "load@example.com")
+        self.set("Provide details to prove ownership/finding of the item*", "It has my name inside")
+        await self.run(self.click("Submit Claim"))
+
+    async def admin_approve(self):
+        await self.open("Admin Dashboard")
+        self.set("Enter Admin Password", ADMIN_PASSWORD)
+        await self.run()
+        # Tick a few pending claims in the claims table, as a moderator clearing a backlog would
+        table_key = next((key for key in self.tables if key.startswith("admin_select_claims_")), None)
+        if table_key is None:
+            return
+        statuses = pyarrow.ipc.open_stream(self.tables[table_key]).read_all().column("Status").to_pylist()
+        pending = [row for row in range(max(0, len(statuses) - 200), len(statuses)) if statuses[row] == 'Pending']
+        if pending:
+            rows = self.rng.sample(pending, min(len(pending), self.rng.randint(1, 5)))
+            ticks = json.dumps({'edited_rows': {str(row): {'Select': True} for row in rows},
+                                'added_rows': [], 'deleted_rows': []})
+            table_id = self.widgets[table_key].id
+            await self.run(WidgetState(id=table_id, string_value=ticks), self.click("Approve Selected"))
+
+
+FLOWS = {
+    'report': Session.report,
+    'search': Session.search,
+    'claim': Session.claim,
+    'admin_approve': Session.admin_approve,
+}
+
+# Share of each flow in the simulated traffic
+FLOW_WEIGHTS = {'report': 3, 'search': 5, 'claim': 2, 'admin_approve': 1}
+
+
+# Function to get the p-th percentile of a list of latencies
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# Function to run N concurrent sessions against the server for a while and summarise their reruns
+async def run_load(url, sessions, duration, seed, timeout, found_ids):
+    timings = {}
+    errors = []
+    flows = list(FLOW_WEIGHTS)
+    weights = [FLOW_WEIGHTS[name] for name in flows]
+    stop_at = time.perf_counter() + duration
+
+    async def client(number):
+        rng = random.Random(seed * 1000 + number)
+        session = Session(url, rng, timings, timeout, found_ids)
+        try:
+            await session.connect()
+            await session.run()
+            while time.perf_counter() < stop_at:
+                await FLOWS[rng.choices(flows, weights)[0]](session)
+        except Exception as error:
+            errors.append(f"session {number}: {type(error).__name__}: {error}")
+        finally:
+            if hasattr(session, 'websocket'):
+                await session.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    pages = {
+        page: {
+            'reruns': len(values),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+        for page, values in sorted(timings.items())
+    }
+    reruns = sum(len(values) for values in timings.values())
+    return {
+        'sessions': sessions,
+        'reruns': reruns,
+        'reruns_per_second': reruns / elapsed,
+        'pages': pages,
+        'errors': errors,
+    }
+
+# Function to print one load level as a table
+def print_result(result):
+    rss = result['server_peak_rss_mb']
+    print(f"\n{result['sessions']} sessions: {result['reruns']} reruns, "
+          f"{result['reruns_per_second']:.1f} reruns/s, server peak RSS "
+          f"{f'{rss:.0f} MB' if rss is not None else 'n/a'}")
+    print(f"  {'page':<24}{'reruns':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for page, stats in result['pages'].items():
+        print(f"  {page:<24}{stats['reruns']:>8}{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    for error in result['errors']:
+        print(f"  ERROR {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent browser sessions against a running app")
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="comma-separated session counts; each level runs in turn to find saturation")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per load level")
+    parser.add_argument("--seed-items", type=int, default=1000, help="synthetic lost and found items each")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before a single rerun fails")
+    parser.add_argument("--port", type=int, default=8599, help="port for the app; its API uses the next one")
+    parser.add_argument("--json", help="also write the results to this file for regression tracking")
+    args = parser.parse_args()
+
+    url = f"ws://localhost:{args.port}/_stcore/stream"
+    api_url = f"http://127.0.0.1:{args.port + 1}"
+    server = start_server(args.port, args.port + 1)
+    try:
+        # The API starts with the app's first script run
+        asyncio.run(run_load(url, 1, 0, args.seed, args.timeout, []))
+        wait_for(f"{api_url}/health", server)
+        found_ids = seed_server(api_url, args.seed_items, random.Random(args.seed))
+        print(f"Seeded {args.seed_items} lost and {args.seed_items} found items")
+
+        results = []
+        for sessions in [int(value) for value in args.sessions.split(",")]:
+            result = asyncio.run(run_load(url, sessions, args.duration, args.seed, args.timeout, found_ids))
+            result['server_peak_rss_mb'] = peak_rss_mb(server.pid)
+            print_result(result)
+            results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({'seed_items': args.seed_items, 'duration': args.duration, 'levels': results}, output, indent=2)
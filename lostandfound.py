@@ -1,9 +1,19 @@
 import streamlit as st
 import datetime
-import uuid
+import os
+import base64
+import binascii
+import concurrent.futures
 import io
 from PIL import Image
-import base64
+import admission
+import analytics
+import api
+import cards
+import item_store
+import maintenance
+import query_cache
+import snapshot
 
 # Set page configuration
 st.set_page_config(
@@ -12,15 +22,56 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state variables if they don't exist
-if 'lost_items' not in st.session_state:
-    st.session_state.lost_items = []
+# Items and claims live in a process-wide store shared by every session and the HTTP API
+store = item_store.shared_store()
+
+# Start the JSON API next to the app once per process when a port is configured
+@st.cache_resource
+def start_api_server(port):
+    return api.serve_in_background(store, port=port)
+
+if os.environ.get("LOSTANDFOUND_API_PORT"):
+    start_api_server(int(os.environ["LOSTANDFOUND_API_PORT"]))
+
+# Snapshot backups are written from the admin dashboard, and by the maintenance
+# scheduler when LOSTANDFOUND_SNAPSHOT_INTERVAL (seconds between incremental snapshots) is set
+@st.cache_resource
+def snapshot_manager(directory):
+    return snapshot.SnapshotManager(store, directory)
+
+snapshots = snapshot_manager(os.environ.get("LOSTANDFOUND_SNAPSHOT_DIR", "snapshots"))
+
+# A snapshot can't stop part-way, so its budget only flags runs that took too long
+SNAPSHOT_BUDGET = 60.0
+
+# Housekeeping runs on one background thread per process, off the request path
+@st.cache_resource
+def maintenance_scheduler():
+    scheduler = maintenance.MaintenanceScheduler()
+    maintenance.add_store_jobs(scheduler, store)
+    if os.environ.get("LOSTANDFOUND_SNAPSHOT_INTERVAL"):
+        scheduler.add("Incremental snapshot", float(os.environ["LOSTANDFOUND_SNAPSHOT_INTERVAL"]),
+                      snapshot.scheduled_job(snapshots, full=False), budget=SNAPSHOT_BUDGET)
+        scheduler.add("Full snapshot", float(os.environ.get("LOSTANDFOUND_FULL_SNAPSHOT_INTERVAL", 86400)),
+                      snapshot.scheduled_job(snapshots, full=True), budget=SNAPSHOT_BUDGET)
+    scheduler.start()
+    return scheduler
+
+scheduler = maintenance_scheduler()
 
-if 'found_items' not in st.session_state:
-    st.session_state.found_items = []
+# Admission control for form submissions, shared by all sessions
+admission_control = admission.shared_controller()
 
-if 'claims' not in st.session_state:
-    st.session_state.claims = []
+# Photos added during front-desk intake are encoded on these threads while staff fill in the grid
+@st.cache_resource
+def photo_workers():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="intake-photos")
+
+# Function to identify the submitting session and its IP address for rate limiting
+def submitter():
+    if 'session_key' not in st.session_state:
+        st.session_state.session_key = os.urandom(8).hex()
+    return st.session_state.session_key, st.context.ip_address
 
 # Function to convert image to base64 for storage
 def image_to_base64(image_file):
@@ -30,18 +81,471 @@ def image_to_base64(image_file):
     encoded = base64.b64encode(file_bytes).decode()
     return encoded
 
-# Function to display base64 image
-def display_image(base64_string, width=300):
-    if base64_string == "" or base64_string is None:
+# Function to show the most similar items of the other kind under a heading
+def render_similar_items(matches, heading):
+    if matches:
+        st.markdown(cards.similar_items_html(matches, heading), unsafe_allow_html=True)
+
+# Function to get an item's photo as bytes, or None if it isn't a readable image
+def image_bytes(item):
+    try:
+        photo = base64.b64decode(item['image'], validate=True)
+        Image.open(io.BytesIO(photo)).verify()
+    except (binascii.Error, OSError, SyntaxError, ValueError):
         return None
+    return photo
+
+# Function to show a list of item cards. Cards without a photo are joined into a
+# single element; a card with one is drawn in a bordered container so the photo
+# goes through st.image and is served as a media file instead of inlined in the HTML.
+def render_item_cards(kind, items, variant='summary', extras=None):
+    html = []
+    for index, item in enumerate(items):
+        extra = extras[index] if extras else ""
+        revision = store.revision(item.key)
+        # Photos are decoded and checked once per revision, not on every rerun
+        photo = cards.cached_photo((item.key, revision), lambda: image_bytes(item)) if item.get('image') else None
+        if photo is None:
+            html.append(cards.item_card(kind, item, revision, variant, extra))
+            continue
+
+        if html:
+            st.markdown("".join(html), unsafe_allow_html=True)
+            html = []
+        with st.container(border=True):
+            st.markdown(cards.item_body(kind, item, revision, variant), unsafe_allow_html=True)
+            st.image(photo, width=200)
+            if extra:
+                st.markdown(extra, unsafe_allow_html=True)
+    if html:
+        st.markdown("".join(html), unsafe_allow_html=True)
+
+# Function to show a whole list of claim cards as a single element
+def render_claim_cards(claims):
+    st.markdown("".join(cards.claim_card(claim, store.revision(claim['id'])) for claim in claims),
+                unsafe_allow_html=True)
+
+# Function to confirm a stored report and point at possible matches of the other kind
+def show_report_confirmation(kind, item):
+    st.success(f"Your {kind} item has been reported successfully!")
+    st.info(f"Your reference ID is: {item['id']}")
+    
+    if kind == 'lost':
+        # Point the reporter at found items that may already be theirs
+        render_similar_items(store.similar_items('found', item_store.item_text(item)),
+                             "Found items that look similar")
+    else:
+        # Point the founder at lost reports that may describe this item
+        render_similar_items(store.similar_items('lost', item_store.item_text(item)),
+                             "Lost reports that look similar")
+
+# Function to file a held-back report after all (button callback)
+def submit_pending_report():
+    kind, item = st.session_state.pop('pending_report')
+    store.add_item(kind, item)
+    st.session_state.report_confirmation = (kind, item['id'])
+
+# Function to drop a held-back report (button callback)
+def discard_pending_report():
+    st.session_state.pop('pending_report', None)
+
+# Function to show a held-back report's likely duplicates and let the reporter decide
+def render_pending_report(kind):
+    confirmation = st.session_state.get('report_confirmation')
+    if confirmation and confirmation[0] == kind:
+        del st.session_state.report_confirmation
+        item = store.get_item(confirmation[1])
+        if item:
+            show_report_confirmation(kind, item)
+    
+    pending = st.session_state.get('pending_report')
+    if not pending or pending[0] != kind:
+        return
+    
+    duplicates = store.find_duplicates(kind, pending[1])
+    st.warning("This looks like an item that has already been reported. "
+               "Please check the reports below before submitting yours.")
+    if duplicates:
+        render_item_cards(kind, [item for item, _ in duplicates],
+                          extras=[f"<small>{score:.0%} similar to your report</small>" for _, score in duplicates])
+    col1, col2 = st.columns(2)
+    col1.button("Submit anyway", on_click=submit_pending_report)
+    col2.button("Don't submit", on_click=discard_pending_report)
+
+# Search results shown per page; similar items are only looked up for the cards on screen
+SEARCH_PAGE_SIZE = 20
+
+# Function to show a page picker under a long result list and return the items on the chosen page
+def results_page(kind, results):
+    pages = -(-len(results) // SEARCH_PAGE_SIZE)
+    if pages <= 1:
+        return results
+    page_key = f"results_page_{kind}"
+    # A new search can have fewer pages than the one before
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = 1
+    page_number = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=page_key)
+    start = (page_number - 1) * SEARCH_PAGE_SIZE
+    st.caption(f"Showing {start + 1}-{min(start + SEARCH_PAGE_SIZE, len(results))} of {len(results)} results")
+    return results[start:start + SEARCH_PAGE_SIZE]
+
+# Function to get the panel of similar items of the other kind under a search result.
+# It only changes with the item or with the other kind's items, so it is cached on both.
+def similar_panel(item, other_kind, heading):
+    key = ('similar', item.key, store.revision(item.key), other_kind, store.versions[other_kind])
+    return cards.cached_body(key, lambda: cards.similar_items_html(
+        store.similar_items(other_kind, item_store.item_text(item), k=3), heading))
+
+# Function to jump to the Claim Item page with an item pre-selected.
+# Used as a button callback, which runs before the navigation radio is drawn.
+def start_claim(item_id, kind):
+    st.session_state.temp_claim_id = item_id
+    st.session_state.temp_claim_type = kind
+    st.session_state.page = "Claim Item"
+
+# Function to drop the pre-selected item once its claim is submitted or abandoned
+def clear_claim_choice():
+    st.session_state.pop('temp_claim_id', None)
+    st.session_state.pop('temp_claim_type', None)
+
+# Function to offer the open items of a result list for claiming
+def render_claim_picker(kind, items, label):
+    open_items = {item['id']: item for item in items if item['status'] == 'Open'}
+    if not open_items:
+        return
+    choice_key = f"claim_choice_{kind}"
+    pick_col, button_col = st.columns([4, 1])
+    pick_col.selectbox(label, list(open_items), key=choice_key,
+                       format_func=lambda item_id: f"{open_items[item_id]['item_name']} (ID: {item_id})")
+    button_col.button("Claim", key=f"claim_button_{kind}",
+                      on_click=lambda: start_claim(st.session_state[choice_key], kind))
+
+# Function to get the ids of the rows ticked in an admin selection table
+def selected_ids(name):
+    edits = st.session_state.get(f"admin_select_{name}_{st.session_state.get('admin_round', 0)}") or {}
+    shown = st.session_state.get(f"admin_rows_{name}", [])
+    rows = [int(row) for row, changes in edits.get('edited_rows', {}).items() if changes.get('Select')]
+    return [shown[row] for row in sorted(rows) if row < len(shown)]
+
+# Function to count records in a message, e.g. "1 item" or "3 items"
+def count_label(count, noun):
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+# Function to confirm a batch action and clear the ticked rows
+def finish_batch(message):
+    st.session_state.admin_message = message
+    st.session_state.admin_round = st.session_state.get('admin_round', 0) + 1
+
+# Function to apply an admin action to every item ticked in a tab (button callback).
+# The whole selection is one store write, and callbacks run before the page is
+# drawn, so the cards already show the change.
+def admin_item_action(kind, action):
+    item_ids = selected_ids(kind)
+    if not item_ids:
+        st.session_state.admin_error = "Tick the items to update in the table first."
+    elif action == 'Delete':
+        finish_batch(f"{count_label(store.delete_items(kind, item_ids), 'item')} deleted")
+    else:
+        finish_batch(f"{count_label(len(store.set_items_status(kind, item_ids, action)), 'item')} marked as {action}")
+
+# Function to merge the picked duplicate into the picked item (button callback)
+def admin_merge_action(kind):
+    keep_id = st.session_state.get(f"admin_pick_{kind}")
+    duplicate_id = st.session_state.get(f"admin_merge_{kind}")
+    if store.merge_items(kind, keep_id, duplicate_id):
+        st.session_state.admin_message = f"Item {duplicate_id} merged into {keep_id}"
+
+# Function to apply an admin action to every ticked claim (button callback)
+def admin_claim_action(action):
+    claim_ids = selected_ids('claims')
+    if not claim_ids:
+        st.session_state.admin_error = "Tick the claims to update in the table first."
+    elif action == 'Delete':
+        finish_batch(f"{count_label(store.delete_claims(claim_ids), 'claim')} deleted")
+    else:
+        # Approving also marks each claimed item as Returned; rejecting puts it back to Open
+        finish_batch(f"{count_label(len(store.set_claims_status(claim_ids, action)), 'claim')} {action.lower()}")
+
+# Function to take or restore a snapshot from the admin dashboard (button callback)
+def admin_snapshot_action(action):
+    try:
+        if action == 'full':
+            result = snapshots.full()
+        elif action == 'delta':
+            result = snapshots.delta()
+        else:
+            result = snapshots.restore()
+    except (OSError, ValueError, snapshot.SnapshotError) as error:
+        st.session_state.admin_error = f"Snapshot {action} failed: {error}"
+        return
+
+    if action == 'restore':
+        st.session_state.admin_message = (
+            f"Restored {result['lost']} lost items, {result['found']} found items and {result['claims']} claims "
+            f"from {result['files']} snapshot files in {result['seconds']:.1f}s. "
+            f"Similar-item and duplicate matching catch up in the background.")
+    elif result is None:
+        st.session_state.admin_message = "Nothing has changed since the last snapshot"
+    else:
+        st.session_state.admin_message = (f"{'Full' if action == 'full' else 'Incremental'} snapshot written: "
+                                          f"{result['records']} records to {os.path.basename(result['path'])}")
+
+# Function to show the snapshot files and backup/restore buttons
+def render_snapshot_panel():
+    files = snapshots.status()
+    if files:
+        st.dataframe(files)
+    else:
+        st.info("No snapshots have been taken yet.")
+    last_run = snapshots.last_run
+    if last_run and last_run['kind'] == 'error':
+        st.error(f"Last scheduled snapshot failed at {last_run['time']}: {last_run['error']}")
+    if not snapshots.complete:
+        st.warning("The app started without restoring the existing snapshots, so it holds only the data "
+                   "entered since. Snapshots taken now are marked incomplete; restore to bring the rest back.")
+
+    full_col, delta_col, restore_col = st.columns(3)
+    full_col.button("Take Full Snapshot", on_click=admin_snapshot_action, args=('full',))
+    delta_col.button("Take Incremental Snapshot", on_click=admin_snapshot_action, args=('delta',))
+    confirmed = restore_col.checkbox("Replace all current data with the latest snapshot")
+    restore_col.button("Restore Latest Snapshot", disabled=not confirmed,
+                       on_click=admin_snapshot_action, args=('restore',))
+
+# Function to show admission control counters and current load
+def render_admission_stats():
+    stats = admission_control.stats()
+    load_cols = st.columns(4)
+    load_cols[0].metric("Processing Now", stats['processing'])
+    load_cols[1].metric("Waiting in Queue", stats['queue_depth'])
+    load_cols[2].metric("Photos in Memory", f"{stats['inflight_upload_mb']:.1f} MB")
+    load_cols[3].metric("Admitted", stats['admitted'])
+    reject_cols = st.columns(3)
+    reject_cols[0].metric("Rejected: Photo Too Large", stats['too_large'])
+    reject_cols[1].metric("Rejected: Rate Limited", stats['rate_limited'])
+    reject_cols[2].metric("Rejected: Busy", stats['busy'])
+
+# Function to show how often filter and search results are served from the cache
+def render_query_cache_stats():
+    info = query_cache.cache_info()
+    hit_cols = st.columns(3)
+    hit_cols[0].metric("Hit Rate", f"{info['hit_rate']:.0%}")
+    hit_cols[1].metric("Hits", info['hits'])
+    hit_cols[2].metric("Misses", info['misses'])
+    entry_cols = st.columns(3)
+    entry_cols[0].metric("Cached Queries", info['size'])
+    entry_cols[1].metric("Invalidated by Writes", info['invalidated'])
+    entry_cols[2].metric("Evicted", info['evicted'])
+
+# Function to run a maintenance job now, on the scheduler's thread (button callback)
+def admin_maintenance_action():
+    job = st.session_state.get('admin_maintenance_job')
+    if job:
+        scheduler.request(job)
+        st.session_state.admin_message = f"{job} will run in the background shortly"
+
+# Function to show a number of seconds the way people say it, e.g. "45s", "5 min" or "24 h"
+def duration_label(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.0f} h"
+
+# Function to show when each maintenance job last ran, how long it took and what it did
+def render_maintenance_stats():
+    jobs = scheduler.stats()
+    st.dataframe([{
+        'Job': job['job'],
+        'Every': duration_label(job['interval']),
+        'Last Run': job['last_run'].strftime("%Y-%m-%d %H:%M:%S") if job['last_run'] else "Not yet",
+        'Took': f"{job['last_duration']:.2f}s" if job['last_duration'] is not None else "",
+        'Budget': f"{job['budget']:.0f}s",
+        'Over Budget': job['over_budget'],
+        'Result': ("Failed: " if job['failed'] else "") + (job['last_result'] or ""),
+        'Next Run In': duration_label(job['next_in']),
+    } for job in jobs], hide_index=True)
+    job_col, run_col = st.columns([3, 1])
+    job_col.selectbox("Job", [job['job'] for job in jobs], key="admin_maintenance_job")
+    run_col.button("Run Now", on_click=admin_maintenance_action)
+
+# Function to show a table whose rows can be ticked for a batch action. It sits in
+# a form with the action buttons, so ticking rows doesn't rerun the page; only the
+# button does. The ids shown are kept so the click acts on exactly the rows that were ticked.
+def render_selection_table(name, rows):
+    st.session_state[f"admin_rows_{name}"] = [row['ID'] for row in rows]
+    columns = list(rows[0]) if rows else []
+    table = {'Select': [False] * len(rows)}
+    table.update((column, [row[column] for row in rows]) for column in columns)
+    st.data_editor(table, key=f"admin_select_{name}_{st.session_state.get('admin_round', 0)}",
+                   hide_index=True, disabled=columns,
+                   column_config={'Select': st.column_config.CheckboxColumn(width="small")})
+
+# Function to show the selection table and batch action buttons under an admin list
+def render_item_actions(kind, items):
+    date_field = 'date_lost' if kind == 'lost' else 'date_found'
+    with st.form(f"admin_select_form_{kind}", border=False):
+        render_selection_table(kind, [
+            {'ID': item['id'], 'Item': item['item_name'], 'Type': item['item_type'], 'Status': item['status'],
+             'Date': item[date_field], 'Reported': item['date_reported']}
+            for item in items
+        ])
+        col1, col2, col3 = st.columns(3)
+        col1.form_submit_button("Mark Selected as Returned", key=f"return_{kind}",
+                                on_click=admin_item_action, args=(kind, 'Returned'))
+        col2.form_submit_button("Mark Selected as Closed", key=f"close_{kind}",
+                                on_click=admin_item_action, args=(kind, 'Closed'))
+        col3.form_submit_button("Delete Selected", key=f"delete_{kind}",
+                                on_click=admin_item_action, args=(kind, 'Delete'))
     
+    # Offer to merge reports that look like duplicates of the picked one
+    names = {item['id']: item['item_name'] for item in items}
+    st.selectbox("Check for duplicates of", list(names), key=f"admin_pick_{kind}",
+                 format_func=lambda item_id: f"{names[item_id]} (ID: {item_id})")
+    selected = store.get_item(st.session_state.get(f"admin_pick_{kind}"))
+    duplicates = store.find_duplicates(kind, selected, exclude=selected['id']) if selected else []
+    if duplicates:
+        labels = {item['id']: f"{item['item_name']} ({score:.0%} similar, ID: {item['id']})"
+                  for item, score in duplicates}
+        merge_col, merge_button_col = st.columns([4, 1])
+        merge_col.selectbox("Possible duplicates of the selected item", list(labels),
+                            key=f"admin_merge_{kind}", format_func=labels.get)
+        merge_button_col.button("Merge into selected", key=f"merge_{kind}",
+                                on_click=admin_merge_action, args=(kind,))
+
+# Function to show the selection table and batch action buttons under the claims list
+def render_claim_actions(claims):
+    with st.form("admin_select_form_claims", border=False):
+        render_selection_table('claims', [
+            {'ID': claim['id'], 'Item ID': claim['item_id'], 'Claimer': claim['claimer_name'],
+             'Status': claim['status'], 'Date Claimed': claim['date_claimed']}
+            for claim in claims
+        ])
+        col1, col2, col3 = st.columns(3)
+        col1.form_submit_button("Approve Selected", on_click=admin_claim_action, args=('Approved',))
+        col2.form_submit_button("Reject Selected", on_click=admin_claim_action, args=('Rejected',))
+        col3.form_submit_button("Delete Selected", key="delete_claims", on_click=admin_claim_action, args=('Delete',))
+
+# Front-desk intake: blank rows the grid starts with (more can be added from the keyboard)
+INTAKE_ROWS = 20
+INTAKE_COLUMNS = ("Item Type", "Item Name", "Description", "Location", "Photo")
+INTAKE_DEFAULTS = ('founder_name', 'contact_info', 'location', 'date_found')
+
+# Function to start encoding newly uploaded intake photos in the background.
+# Returns the photo labels the grid offers, numbered so repeated file names stay apart.
+def process_intake_photos(photos):
+    started = st.session_state.get('intake_jobs', {})
+    jobs, labels = {}, {}
+    for number, photo in enumerate(photos or [], 1):
+        job = started.get(photo.file_id) or photo_workers().submit(image_to_base64, photo)
+        jobs[photo.file_id] = job
+        labels[f"{number}. {photo.name}"] = (photo.size, job)
+    st.session_state.intake_jobs = jobs
+    st.session_state.intake_photos = labels
+    return list(labels)
+
+# Function to rebuild the grid's rows from the edits the data editor keeps in session state
+def intake_rows(edits):
+    rows = [{} for _ in range(INTAKE_ROWS)]
+    for index, changes in edits.get('edited_rows', {}).items():
+        rows[int(index)].update(changes)
+    deleted = set(edits.get('deleted_rows', []))
+    rows = [row for index, row in enumerate(rows) if index not in deleted]
+    rows.extend(dict(row) for row in edits.get('added_rows', []))
+    return [{column: (row.get(column) or "").strip() for column in INTAKE_COLUMNS} for row in rows]
+
+# Function to file every filled-in intake row as a found item in one store write (button callback)
+def save_intake(grid_key):
+    defaults = {name: st.session_state[f"intake_{name}"] for name in INTAKE_DEFAULTS}
+    st.session_state.intake_defaults = defaults
+    defaults = dict(defaults, founder_name=defaults['founder_name'].strip(),
+                    contact_info=defaults['contact_info'].strip(), location=defaults['location'].strip())
+    # A row with nothing but its item type filled in counts as blank
+    rows = [row for row in intake_rows(st.session_state.get(grid_key, {}))
+            if any(row[column] for column in INTAKE_COLUMNS if column != "Item Type")]
+    if not rows:
+        st.session_state.admin_error = "Fill in at least one item in the grid first."
+        return
+    if not (defaults['founder_name'] and defaults['contact_info']):
+        st.session_state.admin_error = "Fill in the founder name and contact information for the batch."
+        return
+    incomplete = [str(number) for number, row in enumerate(rows, 1)
+                  if not (row["Item Name"] and row["Description"] and (row["Location"] or defaults['location']))]
+    if incomplete:
+        st.session_state.admin_error = (f"{'Item' if len(incomplete) == 1 else 'Items'} {', '.join(incomplete)} "
+                                        f"{'needs' if len(incomplete) == 1 else 'need'} a name, a description and "
+                                        f"a location (or a default location for the batch).")
+        return
+
+    photos = st.session_state.get('intake_photos', {})
     try:
-        image_data = base64.b64decode(base64_string)
-        image = Image.open(io.BytesIO(image_data))
-        return image
-    except Exception as e:
-        st.error(f"Error displaying image: {e}")
-        return None
+        with admission_control.admit(*submitter(), upload_sizes=[photos[row["Photo"]][0]
+                                                                 for row in rows if row["Photo"] in photos]):
+            items = [item_store.new_item('found', {
+                'item_type': row["Item Type"] or "Other",
+                'item_name': row["Item Name"],
+                'description': row["Description"],
+                'location': row["Location"] or defaults['location'],
+                'date_found': defaults['date_found'].strftime("%Y-%m-%d"),
+                'founder_name': defaults['founder_name'],
+                'contact_info': defaults['contact_info'],
+                'image': photos[row["Photo"]][1].result() if row["Photo"] in photos else ""
+            }) for row in rows]
+            duplicates = [item['item_name'] for item in items if store.find_duplicates('found', item)]
+            store.add_items('found', items)
+    except admission.Rejected as rejection:
+        st.session_state.admin_error = rejection.message
+        return
+
+    message = f"{count_label(len(items), 'found item')} logged."
+    if duplicates:
+        message += (f" These look like items already reported and may need merging in the Found Items tab: "
+                    f"{', '.join(duplicates)}")
+    st.session_state.admin_message = message
+    st.session_state.intake_round = st.session_state.get('intake_round', 0) + 1
+    st.session_state.pop('intake_jobs', None)
+    st.session_state.pop('intake_photos', None)
+
+# Function to show the front-desk intake grid. The batch details stick between
+# batches; the grid only reruns the page when the whole batch is saved.
+def render_intake():
+    intake_round = st.session_state.get('intake_round', 0)
+    defaults = st.session_state.get('intake_defaults', {})
+    photo_labels = process_intake_photos(st.file_uploader(
+        "Photos for this batch (pick them for items in the Photo column)", type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True, max_upload_size=admission.MAX_UPLOAD_MB, key=f"intake_upload_{intake_round}"))
+
+    with st.form("intake_form"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.text_input("Founder Name*", value=defaults.get('founder_name', ""), key="intake_founder_name")
+        col2.text_input("Contact Information*", value=defaults.get('contact_info', ""), key="intake_contact_info")
+        col3.text_input("Default Found Location", value=defaults.get('location', ""), key="intake_location")
+        col4.date_input("Date Found*", value=defaults.get('date_found', datetime.datetime.now()),
+                        key="intake_date_found")
+
+        grid_key = f"intake_grid_{intake_round}"
+        st.data_editor(
+            {column: [None] * INTAKE_ROWS for column in INTAKE_COLUMNS},
+            key=grid_key, num_rows="dynamic", hide_index=True,
+            column_config={
+                "Item Type": st.column_config.SelectboxColumn(options=item_store.ITEM_TYPES, default="Other"),
+                "Item Name": st.column_config.TextColumn(),
+                "Description": st.column_config.TextColumn(width="large"),
+                "Location": st.column_config.TextColumn(help="Leave blank to use the default found location"),
+                "Photo": st.column_config.SelectboxColumn(options=photo_labels),
+            })
+        st.form_submit_button("Save All Items", on_click=save_intake, args=(grid_key,))
+
+# Function to build the report rollups once per process for each version of the item data.
+# Only lost and found writes change them, so claim writes don't cause a rebuild.
+@st.cache_resource(max_entries=1, show_spinner=False)
+def build_report_rollups(lost_version, found_version):
+    with store.lock:
+        lost_items, found_items = list(store.lost_items), list(store.found_items)
+    return analytics.build_rollups(lost_items, found_items)
+
+# Function to get the report rollups, rebuilt only when the data has changed
+def get_report_rollups():
+    return build_report_rollups(store.versions['lost'], store.versions['found'])
 
 # Create a custom CSS for the app
 st.markdown("""
@@ -94,9 +598,14 @@ st.markdown("<div class='main-header'>📱 Lost & Found System</div>", unsafe_al
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Select Page", 
     ["Home", "Report Lost Item", "Report Found Item", "Search Items", 
-     "Claim Item", "Admin Dashboard"]
+     "Claim Item", "Admin Dashboard", "Statistics and Reports"],
+    key="page"
 )
 
+# Leaving the Claim Item page abandons a claim started from the search results
+if page != "Claim Item":
+    clear_claim_choice()
+
 # Filter options for the sidebar
 st.sidebar.markdown("<div class='sub-header'>Filters</div>", unsafe_allow_html=True)
 item_types = ["All Types", "Electronics", "Clothing", "Documents", "Keys", "Bags", "Jewelry", "Other"]
@@ -126,86 +635,51 @@ def apply_filters(items, item_type_col='item_type', status_col='status', date_co
     
     return filtered_items
 
+# Function to run a filter or search over one kind of item, reusing the ids it
+# found last time if nothing of that kind has been written since. Only ids are
+# cached, so the items shown are always the store's current ones.
+def cached_query(kind, query, run):
+    query = (kind,) + query
+    version = store.versions[kind]
+    keys = query_cache.lookup(query, version)
+    if keys is None:
+        results = run(store.items(kind))
+        query_cache.remember(query, version, [item.key for item in results])
+        return results
+    return [item for item in map(store.get_item, keys) if item is not None]
+
 # Home Page
 if page == "Home":
     st.markdown("<div class='sub-header'>Welcome to the Lost & Found System</div>", unsafe_allow_html=True)
     
     # Dashboard statistics in a row
     col1, col2, col3, col4 = st.columns(4)
+    returned_items = sum(1 for item in store.lost_items if item['status'] == 'Returned')
+    success_rate = (returned_items / len(store.lost_items)) * 100 if store.lost_items else 0
     
-    with col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Lost Items</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{len(st.session_state.lost_items)}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Found Items</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{len(st.session_state.found_items)}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Returned Items</div>", unsafe_allow_html=True)
-        returned_items = sum(1 for item in st.session_state.lost_items if item['status'] == 'Returned')
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{returned_items}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Success Rate</div>", unsafe_allow_html=True)
-        if len(st.session_state.lost_items) > 0:
-            success_rate = (returned_items / len(st.session_state.lost_items)) * 100
-            st.markdown(f"<div style='font-size: 24px; text-align: center;'>{success_rate:.1f}%</div>", unsafe_allow_html=True)
-        else:
-            st.markdown("<div style='font-size: 24px; text-align: center;'>0%</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+    col1.markdown(cards.stat_card("Lost Items", len(store.lost_items)), unsafe_allow_html=True)
+    col2.markdown(cards.stat_card("Found Items", len(store.found_items)), unsafe_allow_html=True)
+    col3.markdown(cards.stat_card("Returned Items", returned_items), unsafe_allow_html=True)
+    col4.markdown(cards.stat_card("Success Rate", f"{success_rate:.1f}%" if store.lost_items else "0%"), unsafe_allow_html=True)
     
     # Recent lost and found items
     st.markdown("<div class='sub-header'>Recent Lost Items</div>", unsafe_allow_html=True)
-    if st.session_state.lost_items:
+    if store.lost_items:
         # Sort items by date (most recent first)
-        recent_lost = sorted(st.session_state.lost_items, 
+        recent_lost = sorted(store.lost_items, 
                             key=lambda x: datetime.datetime.strptime(x['date_reported'], "%Y-%m-%d"), 
                             reverse=True)[:5]
-        
-        for item in recent_lost:
-            st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-            st.markdown(f"<b>{item['item_name']}</b> ({item['item_type']}) - {item['status']}", unsafe_allow_html=True)
-            st.markdown(f"<i>Lost on {item['date_lost']} at {item['location']}</i>", unsafe_allow_html=True)
-            st.markdown(f"<small>Description: {item['description']}</small>", unsafe_allow_html=True)
-            
-            # Display image if available
-            if item['image'] and item['image'] != "":
-                img = display_image(item['image'])
-                if img:
-                    st.image(img, width=200)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        render_item_cards('lost', recent_lost)
     else:
         st.info("No lost items reported yet.")
 
     st.markdown("<div class='sub-header'>Recent Found Items</div>", unsafe_allow_html=True)
-    if st.session_state.found_items:
+    if store.found_items:
         # Sort items by date (most recent first)
-        recent_found = sorted(st.session_state.found_items, 
+        recent_found = sorted(store.found_items, 
                              key=lambda x: datetime.datetime.strptime(x['date_reported'], "%Y-%m-%d"), 
                              reverse=True)[:5]
-        
-        for item in recent_found:
-            st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-            st.markdown(f"<b>{item['item_name']}</b> ({item['item_type']}) - {item['status']}", unsafe_allow_html=True)
-            st.markdown(f"<i>Found on {item['date_found']} at {item['location']}</i>", unsafe_allow_html=True)
-            st.markdown(f"<small>Description: {item['description']}</small>", unsafe_allow_html=True)
-            
-            # Display image if available
-            if item['image'] and item['image'] != "":
-                img = display_image(item['image'])
-                if img:
-                    st.image(img, width=200)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        render_item_cards('found', recent_found)
     else:
         st.info("No found items reported yet.")
 
@@ -226,7 +700,8 @@ elif page == "Report Lost Item":
             date_lost = st.date_input("Date Lost*", datetime.datetime.now())
             reporter_name = st.text_input("Your Name*")
             contact_info = st.text_input("Contact Information (Phone/Email)*")
-            image_file = st.file_uploader("Upload Image (if available)", type=["jpg", "jpeg", "png"])
+            image_file = st.file_uploader("Upload Image (if available)", type=["jpg", "jpeg", "png"],
+                                          max_upload_size=admission.MAX_UPLOAD_MB)
         
         submit_button = st.form_submit_button("Submit Report")
         
@@ -235,29 +710,34 @@ elif page == "Report Lost Item":
             if not (item_name and description and location and reporter_name and contact_info):
                 st.error("Please fill all required fields marked with *")
             else:
-                # Convert image to base64 if available
-                image_base64 = image_to_base64(image_file) if image_file else ""
+                # Turn the submission away early if the photo is too large or the system is overloaded
+                try:
+                    with admission_control.admit(*submitter(), upload_sizes=[image_file.size] if image_file else []):
+                        # Convert image to base64 if available
+                        image_base64 = image_to_base64(image_file) if image_file else ""
                 
-                # Create new lost item entry
-                new_item = {
-                    'id': str(uuid.uuid4()),
-                    'item_type': item_type,
-                    'item_name': item_name,
-                    'description': description,
-                    'location': location,
-                    'date_lost': date_lost.strftime("%Y-%m-%d"),
-                    'reporter_name': reporter_name,
-                    'contact_info': contact_info,
-                    'status': 'Open',
-                    'date_reported': datetime.datetime.now().strftime("%Y-%m-%d"),
-                    'image': image_base64
-                }
+                        # Create new lost item entry
+                        new_item = item_store.new_item('lost', {
+                            'item_type': item_type,
+                            'item_name': item_name,
+                            'description': description,
+                            'location': location,
+                            'date_lost': date_lost.strftime("%Y-%m-%d"),
+                            'reporter_name': reporter_name,
+                            'contact_info': contact_info,
+                            'image': image_base64
+                        })
                 
-                # Add to session state
-                st.session_state.lost_items.append(new_item)
-                
-                st.success("Your lost item has been reported successfully!")
-                st.info(f"Your reference ID is: {new_item['id']}")
+                        # Hold the report back if it looks like one that already exists
+                        if store.find_duplicates('lost', new_item):
+                            st.session_state.pending_report = ('lost', new_item)
+                        else:
+                            store.add_item('lost', new_item)
+                            show_report_confirmation('lost', new_item)
+                except admission.Rejected as rejection:
+                    st.error(rejection.message)
+    
+    render_pending_report('lost')
 
 # Report Found Item Page
 elif page == "Report Found Item":
@@ -276,7 +756,8 @@ elif page == "Report Found Item":
             date_found = st.date_input("Date Found*", datetime.datetime.now())
             founder_name = st.text_input("Your Name*")
             contact_info = st.text_input("Contact Information (Phone/Email)*")
-            image_file = st.file_uploader("Upload Image (if available)", type=["jpg", "jpeg", "png"])
+            image_file = st.file_uploader("Upload Image (if available)", type=["jpg", "jpeg", "png"],
+                                          max_upload_size=admission.MAX_UPLOAD_MB)
         
         submit_button = st.form_submit_button("Submit Report")
         
@@ -285,29 +766,34 @@ elif page == "Report Found Item":
             if not (item_name and description and location and founder_name and contact_info):
                 st.error("Please fill all required fields marked with *")
             else:
-                # Convert image to base64 if available
-                image_base64 = image_to_base64(image_file) if image_file else ""
+                # Turn the submission away early if the photo is too large or the system is overloaded
+                try:
+                    with admission_control.admit(*submitter(), upload_sizes=[image_file.size] if image_file else []):
+                        # Convert image to base64 if available
+                        image_base64 = image_to_base64(image_file) if image_file else ""
                 
-                # Create new found item entry
-                new_item = {
-                    'id': str(uuid.uuid4()),
-                    'item_type': item_type,
-                    'item_name': item_name,
-                    'description': description,
-                    'location': location,
-                    'date_found': date_found.strftime("%Y-%m-%d"),
-                    'founder_name': founder_name,
-                    'contact_info': contact_info,
-                    'status': 'Open',
-                    'date_reported': datetime.datetime.now().strftime("%Y-%m-%d"),
-                    'image': image_base64
-                }
+                        # Create new found item entry
+                        new_item = item_store.new_item('found', {
+                            'item_type': item_type,
+                            'item_name': item_name,
+                            'description': description,
+                            'location': location,
+                            'date_found': date_found.strftime("%Y-%m-%d"),
+                            'founder_name': founder_name,
+                            'contact_info': contact_info,
+                            'image': image_base64
+                        })
                 
-                # Add to session state
-                st.session_state.found_items.append(new_item)
-                
-                st.success("Your found item has been reported successfully!")
-                st.info(f"Your reference ID is: {new_item['id']}")
+                        # Hold the report back if it looks like one that already exists
+                        if store.find_duplicates('found', new_item):
+                            st.session_state.pending_report = ('found', new_item)
+                        else:
+                            store.add_item('found', new_item)
+                            show_report_confirmation('found', new_item)
+                except admission.Rejected as rejection:
+                    st.error(rejection.message)
+    
+    render_pending_report('found')
 
 # Search Items Page
 elif page == "Search Items":
@@ -325,84 +811,44 @@ elif page == "Search Items":
     with search_col2:
         search_item_type = st.selectbox("Filter by Type", item_types)
     
-    # Search function
-    def search_items(items, term, item_type):
-        results = []
-        term = term.lower()
-        
-        for item in items:
-            # Check if search term exists in name, description or location
-            name_match = term in item.get('item_name', '').lower()
-            desc_match = term in item.get('description', '').lower()
-            loc_match = term in item.get('location', '').lower()
-            
-            # Check if item type matches
-            type_match = item_type == "All Types" or item.get('item_type') == item_type
-            
-            if (name_match or desc_match or loc_match) and type_match:
-                results.append(item)
-        
-        return results
-    
-    # Perform search when button is clicked
+    # Perform search when button is clicked; results stay up while claiming from them
     if st.button("Search"):
+        st.session_state.search_active = True
+        st.session_state.pop('results_page_lost', None)
+        st.session_state.pop('results_page_found', None)
+    
+    if st.session_state.get('search_active'):
         lost_results = []
         found_results = []
         
         if search_type in ["Lost Items", "Both"]:
-            lost_results = search_items(st.session_state.lost_items, search_term, search_item_type)
+            lost_results = cached_query('lost', (page, search_item_type, None, None, None, search_term),
+                                        lambda items: item_store.search_items(items, search_term, search_item_type))
             
         if search_type in ["Found Items", "Both"]:
-            found_results = search_items(st.session_state.found_items, search_term, search_item_type)
+            found_results = cached_query('found', (page, search_item_type, None, None, None, search_term),
+                                         lambda items: item_store.search_items(items, search_term, search_item_type))
         
         # Display results
         if search_type in ["Lost Items", "Both"]:
             st.markdown("<div class='section-header'>Lost Items Results</div>", unsafe_allow_html=True)
             if lost_results:
-                for item in lost_results:
-                    st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                    st.markdown(f"<b>{item['item_name']}</b> ({item['item_type']}) - {item['status']}", unsafe_allow_html=True)
-                    st.markdown(f"<i>Lost on {item['date_lost']} at {item['location']}</i>", unsafe_allow_html=True)
-                    st.markdown(f"Description: {item['description']}", unsafe_allow_html=True)
-                    
-                    # Display image if available
-                    if item['image'] and item['image'] != "":
-                        img = display_image(item['image'])
-                        if img:
-                            st.image(img, width=200)
-                    
-                    if item['status'] == 'Open':
-                        if st.button(f"I found this item! (ID: {item['id']})", key=f"found_{item['id']}"):
-                            st.session_state.temp_claim_id = item['id']
-                            st.session_state.temp_claim_type = 'lost'
-                            st.experimental_rerun()
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+                shown = results_page('lost', lost_results)
+                render_item_cards('lost', shown, extras=[
+                    similar_panel(item, 'found', "Similar found items") for item in shown
+                ])
+                render_claim_picker('lost', shown, "I found one of these items!")
             else:
                 st.info("No matching lost items found.")
         
         if search_type in ["Found Items", "Both"]:
             st.markdown("<div class='section-header'>Found Items Results</div>", unsafe_allow_html=True)
             if found_results:
-                for item in found_results:
-                    st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                    st.markdown(f"<b>{item['item_name']}</b> ({item['item_type']}) - {item['status']}", unsafe_allow_html=True)
-                    st.markdown(f"<i>Found on {item['date_found']} at {item['location']}</i>", unsafe_allow_html=True)
-                    st.markdown(f"Description: {item['description']}", unsafe_allow_html=True)
-                    
-                    # Display image if available
-                    if item['image'] and item['image'] != "":
-                        img = display_image(item['image'])
-                        if img:
-                            st.image(img, width=200)
-                    
-                    if item['status'] == 'Open':
-                        if st.button(f"This is mine! (ID: {item['id']})", key=f"mine_{item['id']}"):
-                            st.session_state.temp_claim_id = item['id']
-                            st.session_state.temp_claim_type = 'found'
-                            st.experimental_rerun()
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+                shown = results_page('found', found_results)
+                render_item_cards('found', shown, extras=[
+                    similar_panel(item, 'lost', "Similar lost reports") for item in shown
+                ])
+                render_claim_picker('found', shown, "One of these is mine!")
             else:
                 st.info("No matching found items found.")
 
@@ -410,25 +856,23 @@ elif page == "Search Items":
 elif page == "Claim Item":
     st.markdown("<div class='sub-header'>Claim an Item</div>", unsafe_allow_html=True)
     
-    # Check if we're coming from the search page with a pre-selected item
-    claim_id = ""
-    claim_type = ""
-    
-    if 'temp_claim_id' in st.session_state and 'temp_claim_type' in st.session_state:
-        claim_id = st.session_state.temp_claim_id
-        claim_type = st.session_state.temp_claim_type
-        # Clear temporary session state
-        del st.session_state.temp_claim_id
-        del st.session_state.temp_claim_type
+    # Check if we're coming from the search page with a pre-selected item.
+    # It stays selected across reruns until the claim is submitted or abandoned.
+    claim_id = st.session_state.get('temp_claim_id', "")
+    claim_type = st.session_state.get('temp_claim_type', "")
+    if claim_id:
+        st.button("Claim a different item", on_click=clear_claim_choice)
     
     # Form for claiming an item
     with st.form("claim_form"):
         if not claim_id:
             claim_type = st.radio("Type of Item to Claim", ["Lost", "Found"])
             claim_id = st.text_input("Item Reference ID*")
+            # "Lost" means the claimer lost the item, so it is looked up among found items
+            claim_kind = 'found' if claim_type == "Lost" else 'lost'
         else:
             st.info(f"Claiming {'Lost' if claim_type == 'lost' else 'Found'} item with ID: {claim_id}")
-            claim_type = "Lost" if claim_type == 'lost' else "Found"
+            claim_kind = claim_type
         
         claimer_name = st.text_input("Your Name*")
         contact_info = st.text_input("Contact Information (Phone/Email)*")
@@ -441,64 +885,19 @@ elif page == "Claim Item":
             if not (claim_id and claimer_name and contact_info and proof_description):
                 st.error("Please fill all required fields marked with *")
             else:
-                found = False
-                
-                # Check if item exists
-                if claim_type == "Lost":
-                    for item in st.session_state.found_items:
-                        if item['id'] == claim_id and item['status'] == 'Open':
-                            found = True
-                            
-                            # Create claim
-                            new_claim = {
-                                'id': str(uuid.uuid4()),
-                                'item_id': claim_id,
-                                'item_type': 'Found',
-                                'claimer_name': claimer_name,
-                                'contact_info': contact_info,
-                                'description': proof_description,
-                                'date_claimed': datetime.datetime.now().strftime("%Y-%m-%d"),
-                                'status': 'Pending'
-                            }
-                            
-                            # Update item status
-                            item['status'] = 'Claimed'
-                            
-                            # Add claim to session state
-                            st.session_state.claims.append(new_claim)
-                            
-                            st.success("Your claim has been submitted successfully!")
-                            st.info(f"Your claim reference ID is: {new_claim['id']}")
-                            break
+                try:
+                    with admission_control.admit(*submitter()):
+                        # Create the claim and mark the item as Claimed in one step
+                        new_claim = store.submit_claim(claim_kind, claim_id, claimer_name, contact_info, proof_description)
+                except admission.Rejected as rejection:
+                    st.error(rejection.message)
                 else:
-                    for item in st.session_state.lost_items:
-                        if item['id'] == claim_id and item['status'] == 'Open':
-                            found = True
-                            
-                            # Create claim
-                            new_claim = {
-                                'id': str(uuid.uuid4()),
-                                'item_id': claim_id,
-                                'item_type': 'Lost',
-                                'claimer_name': claimer_name,
-                                'contact_info': contact_info,
-                                'description': proof_description,
-                                'date_claimed': datetime.datetime.now().strftime("%Y-%m-%d"),
-                                'status': 'Pending'
-                            }
-                            
-                            # Update item status
-                            item['status'] = 'Claimed'
-                            
-                            # Add claim to session state
-                            st.session_state.claims.append(new_claim)
-                            
-                            st.success("Your claim has been submitted successfully!")
-                            st.info(f"Your claim reference ID is: {new_claim['id']}")
-                            break
-                
-                if not found:
-                    st.error("Item not found or is no longer available for claiming.")
+                    if new_claim:
+                        clear_claim_choice()
+                        st.success("Your claim has been submitted successfully!")
+                        st.info(f"Your claim reference ID is: {new_claim['id']}")
+                    else:
+                        st.error("Item not found or is no longer available for claiming.")
 
 # Admin Dashboard
 elif page == "Admin Dashboard":
@@ -508,61 +907,24 @@ elif page == "Admin Dashboard":
     password = st.text_input("Enter Admin Password", type="password")
     
     if password == "admin123":  # Simple password for demo purposes
-        admin_tab1, admin_tab2, admin_tab3 = st.tabs(["Lost Items", "Found Items", "Claims"])
+        if 'admin_message' in st.session_state:
+            st.success(st.session_state.pop('admin_message'))
+        if 'admin_error' in st.session_state:
+            st.error(st.session_state.pop('admin_error'))
+        
+        admin_tab1, admin_tab2, admin_tab3, admin_tab4, admin_tab5, admin_tab6 = st.tabs(
+            ["Lost Items", "Found Items", "Claims", "Intake", "Backups", "System"])
         
         with admin_tab1:
             st.markdown("<div class='section-header'>Manage Lost Items</div>", unsafe_allow_html=True)
             
             # Apply filters
-            filtered_lost = apply_filters(st.session_state.lost_items)
+            filtered_lost = cached_query('lost', (page, filter_type, filter_status, start_date, end_date, None),
+                                         apply_filters)
             
             if filtered_lost:
-                for i, item in enumerate(filtered_lost):
-                    st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                    st.markdown(f"<b>ID:</b> {item['id']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Item:</b> {item['item_name']} ({item['item_type']})", unsafe_allow_html=True)
-                    st.markdown(f"<b>Status:</b> {item['status']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Reporter:</b> {item['reporter_name']} - {item['contact_info']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Details:</b> Lost on {item['date_lost']} at {item['location']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Description:</b> {item['description']}", unsafe_allow_html=True)
-                    
-                    # Display image if available
-                    if item['image'] and item['image'] != "":
-                        img = display_image(item['image'])
-                        if img:
-                            st.image(img, width=200)
-                    
-                    # Action buttons
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        if st.button("Mark as Returned", key=f"return_lost_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.lost_items):
-                                if original_item['id'] == item['id']:
-                                    st.session_state.lost_items[idx]['status'] = 'Returned'
-                                    st.success(f"Item {item['id']} marked as Returned")
-                                    break
-                    
-                    with col2:
-                        if st.button("Mark as Closed", key=f"close_lost_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.lost_items):
-                                if original_item['id'] == item['id']:
-                                    st.session_state.lost_items[idx]['status'] = 'Closed'
-                                    st.success(f"Item {item['id']} marked as Closed")
-                                    break
-                    
-                    with col3:
-                        if st.button("Delete", key=f"delete_lost_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.lost_items):
-                                if original_item['id'] == item['id']:
-                                    del st.session_state.lost_items[idx]
-                                    st.success(f"Item {item['id']} deleted")
-                                    break
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+                render_item_cards('lost', filtered_lost, variant='admin')
+                render_item_actions('lost', filtered_lost)
             else:
                 st.info("No lost items match the current filters.")
         
@@ -570,130 +932,39 @@ elif page == "Admin Dashboard":
             st.markdown("<div class='section-header'>Manage Found Items</div>", unsafe_allow_html=True)
             
             # Apply filters
-            filtered_found = apply_filters(st.session_state.found_items)
+            filtered_found = cached_query('found', (page, filter_type, filter_status, start_date, end_date, None),
+                                          apply_filters)
             
             if filtered_found:
-                for i, item in enumerate(filtered_found):
-                    st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                    st.markdown(f"<b>ID:</b> {item['id']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Item:</b> {item['item_name']} ({item['item_type']})", unsafe_allow_html=True)
-                    st.markdown(f"<b>Status:</b> {item['status']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Founder:</b> {item['founder_name']} - {item['contact_info']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Details:</b> Found on {item['date_found']} at {item['location']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Description:</b> {item['description']}", unsafe_allow_html=True)
-                    
-                    # Display image if available
-                    if item['image'] and item['image'] != "":
-                        img = display_image(item['image'])
-                        if img:
-                            st.image(img, width=200)
-                    
-                    # Action buttons
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        if st.button("Mark as Returned", key=f"return_found_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.found_items):
-                                if original_item['id'] == item['id']:
-                                    st.session_state.found_items[idx]['status'] = 'Returned'
-                                    st.success(f"Item {item['id']} marked as Returned")
-                                    break
-                    
-                    with col2:
-                        if st.button("Mark as Closed", key=f"close_found_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.found_items):
-                                if original_item['id'] == item['id']:
-                                    st.session_state.found_items[idx]['status'] = 'Closed'
-                                    st.success(f"Item {item['id']} marked as Closed")
-                                    break
-                    
-                    with col3:
-                        if st.button("Delete", key=f"delete_found_{i}"):
-                            # Find the item in the original list
-                            for idx, original_item in enumerate(st.session_state.found_items):
-                                if original_item['id'] == item['id']:
-                                    del st.session_state.found_items[idx]
-                                    st.success(f"Item {item['id']} deleted")
-                                    break
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+                render_item_cards('found', filtered_found, variant='admin')
+                render_item_actions('found', filtered_found)
             else:
                 st.info("No found items match the current filters.")
         
         with admin_tab3:
             st.markdown("<div class='section-header'>Manage Claims</div>", unsafe_allow_html=True)
             
-            if st.session_state.claims:
-                for i, claim in enumerate(st.session_state.claims):
-                    st.markdown(f"<div class='card'>", unsafe_allow_html=True)
-                    st.markdown(f"<b>Claim ID:</b> {claim['id']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Item ID:</b> {claim['item_id']} ({claim['item_type']} Item)", unsafe_allow_html=True)
-                    st.markdown(f"<b>Status:</b> {claim['status']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Claimer:</b> {claim['claimer_name']} - {claim['contact_info']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Date Claimed:</b> {claim['date_claimed']}", unsafe_allow_html=True)
-                    st.markdown(f"<b>Proof/Description:</b> {claim['description']}", unsafe_allow_html=True)
-                    
-                    # Action buttons
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        if st.button("Approve Claim", key=f"approve_{i}"):
-                            # Find the claim in the original list
-                            for idx, original_claim in enumerate(st.session_state.claims):
-                                if original_claim['id'] == claim['id']:
-                                    st.session_state.claims[idx]['status'] = 'Approved'
-                                    
-                                    # Update the item status
-                                    if claim['item_type'] == 'Lost':
-                                        for ldx, lost_item in enumerate(st.session_state.lost_items):
-                                            if lost_item['id'] == claim['item_id']:
-                                                st.session_state.lost_items[ldx]['status'] = 'Returned'
-                                                break
-                                    else:
-                                        for fdx, found_item in enumerate(st.session_state.found_items):
-                                            if found_item['id'] == claim['item_id']:
-                                                st.session_state.found_items[fdx]['status'] = 'Returned'
-                                                break
-                                    
-                                    st.success(f"Claim {claim['id']} approved")
-                                    break
-                    
-                    with col2:
-                        if st.button("Reject Claim", key=f"reject_{i}"):
-                            # Find the claim in the original list
-                            for idx, original_claim in enumerate(st.session_state.claims):
-                                if original_claim['id'] == claim['id']:
-                                    st.session_state.claims[idx]['status'] = 'Rejected'
-                                    
-                                    # Update the item status back to Open
-                                    if claim['item_type'] == 'Lost':
-                                        for ldx, lost_item in enumerate(st.session_state.lost_items):
-                                            if lost_item['id'] == claim['item_id']:
-                                                st.session_state.lost_items[ldx]['status'] = 'Open'
-                                                break
-                                    else:
-                                        for fdx, found_item in enumerate(st.session_state.found_items):
-                                            if found_item['id'] == claim['item_id']:
-                                                st.session_state.found_items[fdx]['status'] = 'Open'
-                                                break
-                                    
-                                    st.success(f"Claim {claim['id']} rejected")
-                                    break
-                    
-                    with col3:
-                        if st.button("Delete Claim", key=f"delete_claim_{i}"):
-                            # Find the claim in the original list
-                            for idx, original_claim in enumerate(st.session_state.claims):
-                                if original_claim['id'] == claim['id']:
-                                    del st.session_state.claims[idx]
-                                    st.success(f"Claim {claim['id']} deleted")
-                                    break
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
+            if store.claims:
+                render_claim_cards(store.claims)
+                render_claim_actions(store.claims)
             else:
                 st.info("No claims have been made yet.")
+        
+        with admin_tab4:
+            st.markdown("<div class='section-header'>Front Desk Intake</div>", unsafe_allow_html=True)
+            render_intake()
+        
+        with admin_tab5:
+            st.markdown("<div class='section-header'>Snapshots</div>", unsafe_allow_html=True)
+            render_snapshot_panel()
+        
+        with admin_tab6:
+            st.markdown("<div class='section-header'>Submission Load</div>", unsafe_allow_html=True)
+            render_admission_stats()
+            st.markdown("<div class='section-header'>Query Cache</div>", unsafe_allow_html=True)
+            render_query_cache_stats()
+            st.markdown("<div class='section-header'>Maintenance</div>", unsafe_allow_html=True)
+            render_maintenance_stats()
     else:
         st.warning("Please enter the correct admin password to access the dashboard.")
 
@@ -703,227 +974,74 @@ elif page == "Statistics and Reports":
     
     # Date range for the reports
     st.sidebar.write("Report Period:")
-    report_start_date = st.sidebar.date_input("Start Date", datetime.datetime.now() - datetime.timedelta(days=90))
-    report_end_date = st.sidebar.date_input("End Date", datetime.datetime.now())
-    
-    # Generate statistics
-    total_lost = len(st.session_state.lost_items)
-    total_found = len(st.session_state.found_items)
-    returned_items = sum(1 for item in st.session_state.lost_items if item['status'] == 'Returned')
-    
-    # Filter items within the date range
-    filtered_lost = []
-    filtered_found = []
-    for item in st.session_state.lost_items:
-        item_date = datetime.datetime.strptime(item['date_reported'], "%Y-%m-%d").date()
-        if report_start_date <= item_date <= report_end_date:
-            filtered_lost.append(item)
-    
-    for item in st.session_state.found_items:
-        item_date = datetime.datetime.strptime(item['date_reported'], "%Y-%m-%d").date()
-        if report_start_date <= item_date <= report_end_date:
-            filtered_found.append(item)
-    
-    # Count items by type
-    lost_by_type = {}
-    found_by_type = {}
-    
-    for item in filtered_lost:
-        if item['item_type'] in lost_by_type:
-            lost_by_type[item['item_type']] += 1
-        else:
-            lost_by_type[item['item_type']] = 1
+    report_start_date = st.sidebar.date_input("Start Date", datetime.datetime.now() - datetime.timedelta(days=90), key="report_start_date")
+    report_end_date = st.sidebar.date_input("End Date", datetime.datetime.now(), key="report_end_date")
     
-    for item in filtered_found:
-        if item['item_type'] in found_by_type:
-            found_by_type[item['item_type']] += 1
-        else:
-            found_by_type[item['item_type']] = 1
+    # Generate statistics from the pre-aggregated daily rollups
+    rollups = get_report_rollups()
+    summary = analytics.period_summary(rollups, report_start_date, report_end_date)
+    previous_start_date, previous_end_date = analytics.previous_period(report_start_date, report_end_date)
+    previous = analytics.period_summary(rollups, previous_start_date, previous_end_date)
     
-    # Count items by status
-    lost_by_status = {}
-    found_by_status = {}
-    
-    for item in filtered_lost:
-        if item['status'] in lost_by_status:
-            lost_by_status[item['status']] += 1
-        else:
-            lost_by_status[item['status']] = 1
-    
-    for item in filtered_found:
-        if item['status'] in found_by_status:
-            found_by_status[item['status']] += 1
-        else:
-            found_by_status[item['status']] = 1
+    lost_by_type = summary['lost_by_type']
+    found_by_type = summary['found_by_type']
+    lost_by_status = summary['lost_by_status']
+    found_by_status = summary['found_by_status']
     
     # Display statistics
     st.markdown("<div class='section-header'>Summary Statistics</div>", unsafe_allow_html=True)
+    st.caption(f"Compared with the previous period ({previous_start_date} to {previous_end_date})")
     
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Lost Items</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{len(filtered_lost)}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.metric("Lost Items", summary['lost'], summary['lost'] - previous['lost'])
     
     with col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Found Items</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{len(filtered_found)}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.metric("Found Items", summary['found'], summary['found'] - previous['found'])
     
     with col3:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Returned Items</div>", unsafe_allow_html=True)
-        returned_in_period = sum(1 for item in filtered_lost if item['status'] == 'Returned')
-        st.markdown(f"<div style='font-size: 24px; text-align: center;'>{returned_in_period}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.metric("Returned Items", summary['returned'], summary['returned'] - previous['returned'])
     
     with col4:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Recovery Rate</div>", unsafe_allow_html=True)
-        if len(filtered_lost) > 0:
-            recovery_rate = (returned_in_period / len(filtered_lost)) * 100
-            st.markdown(f"<div style='font-size: 24px; text-align: center;'>{recovery_rate:.1f}%</div>", unsafe_allow_html=True)
+        st.metric("Recovery Rate", f"{summary['recovery_rate']:.1f}%",
+                  f"{summary['recovery_rate'] - previous['recovery_rate']:.1f}%")
+    
+    with col5:
+        median_days = summary['median_days_to_return']
+        previous_median_days = previous['median_days_to_return']
+        if median_days is None:
+            st.metric("Median Days to Return", "-")
+        elif previous_median_days is None:
+            st.metric("Median Days to Return", f"{median_days:g}")
         else:
-            st.markdown("<div style='font-size: 24px; text-align: center;'>0%</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+            # Fewer days is better, so invert the delta colour
+            st.metric("Median Days to Return", f"{median_days:g}", f"{median_days - previous_median_days:g}",
+                      delta_color="inverse")
+    
+    # Trends over the report period
+    st.markdown("<div class='section-header'>Trends</div>", unsafe_allow_html=True)
+    trend_frequency = st.radio("Group by", list(analytics.TREND_FREQUENCIES), horizontal=True)
+    st.line_chart(analytics.trend(rollups, report_start_date, report_end_date, trend_frequency))
     
     # Draw charts - Create data for visualization
     st.markdown("<div class='section-header'>Item Categories</div>", unsafe_allow_html=True)
     
-    # Display simple bar charts
-    lost_type_data = [[category, count] for category, count in lost_by_type.items()]
-    found_type_data = [[category, count] for category, count in found_by_type.items()]
-    
     # Use columns for side-by-side charts
     chart_col1, chart_col2 = st.columns(2)
-    
-    with chart_col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Lost Items by Type</div>", unsafe_allow_html=True)
-        
-        # Create simple HTML/CSS bar chart
-        for category, count in sorted(lost_by_type.items(), key=lambda x: x[1], reverse=True):
-            # Calculate percentage of total
-            percentage = (count / len(filtered_lost)) * 100 if filtered_lost else 0
-            
-            st.markdown(f"""
-            <div style="margin-bottom: 8px;">
-                <div style="display: flex; align-items: center;">
-                    <div style="width: 100px; font-weight: bold;">{category}</div>
-                    <div style="flex-grow: 1; margin: 0 10px;">
-                        <div style="background-color: #f0f2f6; border-radius: 4px; height: 24px; width: 100%;">
-                            <div style="background-color: #1E88E5; border-radius: 4px; height: 24px; width: {percentage}%"></div>
-                        </div>
-                    </div>
-                    <div style="width: 50px; text-align: right;">{count}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with chart_col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Found Items by Type</div>", unsafe_allow_html=True)
-        
-        # Create simple HTML/CSS bar chart
-        for category, count in sorted(found_by_type.items(), key=lambda x: x[1], reverse=True):
-            # Calculate percentage of total
-            percentage = (count / len(filtered_found)) * 100 if filtered_found else 0
-            
-            st.markdown(f"""
-            <div style="margin-bottom: 8px;">
-                <div style="display: flex; align-items: center;">
-                    <div style="width: 100px; font-weight: bold;">{category}</div>
-                    <div style="flex-grow: 1; margin: 0 10px;">
-                        <div style="background-color: #f0f2f6; border-radius: 4px; height: 24px; width: 100%;">
-                            <div style="background-color: #4CAF50; border-radius: 4px; height: 24px; width: {percentage}%"></div>
-                        </div>
-                    </div>
-                    <div style="width: 50px; text-align: right;">{count}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    chart_col1.markdown(cards.bar_chart_card("Lost Items by Type", lost_by_type, summary['lost'], '#1E88E5'),
+                        unsafe_allow_html=True)
+    chart_col2.markdown(cards.bar_chart_card("Found Items by Type", found_by_type, summary['found'], '#4CAF50'),
+                        unsafe_allow_html=True)
     
     # Add status charts
     st.markdown("<div class='section-header'>Item Status</div>", unsafe_allow_html=True)
     
     status_col1, status_col2 = st.columns(2)
-    
-    with status_col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Lost Items by Status</div>", unsafe_allow_html=True)
-        
-        # Create simple HTML/CSS bar chart
-        for status, count in sorted(lost_by_status.items(), key=lambda x: x[1], reverse=True):
-            # Calculate percentage of total
-            percentage = (count / len(filtered_lost)) * 100 if filtered_lost else 0
-            
-            # Choose color based on status
-            if status == 'Returned':
-                color = '#4CAF50'  # Green
-            elif status == 'Open':
-                color = '#FFC107'  # Yellow
-            elif status == 'Claimed':
-                color = '#2196F3'  # Blue
-            else:
-                color = '#9E9E9E'  # Grey
-            
-            st.markdown(f"""
-            <div style="margin-bottom: 8px;">
-                <div style="display: flex; align-items: center;">
-                    <div style="width: 100px; font-weight: bold;">{status}</div>
-                    <div style="flex-grow: 1; margin: 0 10px;">
-                        <div style="background-color: #f0f2f6; border-radius: 4px; height: 24px; width: 100%;">
-                            <div style="background-color: {color}; border-radius: 4px; height: 24px; width: {percentage}%"></div>
-                        </div>
-                    </div>
-                    <div style="width: 50px; text-align: right;">{count}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with status_col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Found Items by Status</div>", unsafe_allow_html=True)
-        
-        # Create simple HTML/CSS bar chart
-        for status, count in sorted(found_by_status.items(), key=lambda x: x[1], reverse=True):
-            # Calculate percentage of total
-            percentage = (count / len(filtered_found)) * 100 if filtered_found else 0
-            
-            # Choose color based on status
-            if status == 'Returned':
-                color = '#4CAF50'  # Green
-            elif status == 'Open':
-                color = '#FFC107'  # Yellow
-            elif status == 'Claimed':
-                color = '#2196F3'  # Blue
-            else:
-                color = '#9E9E9E'  # Grey
-            
-            st.markdown(f"""
-            <div style="margin-bottom: 8px;">
-                <div style="display: flex; align-items: center;">
-                    <div style="width: 100px; font-weight: bold;">{status}</div>
-                    <div style="flex-grow: 1; margin: 0 10px;">
-                        <div style="background-color: #f0f2f6; border-radius: 4px; height: 24px; width: 100%;">
-                            <div style="background-color: {color}; border-radius: 4px; height: 24px; width: {percentage}%"></div>
-                        </div>
-                    </div>
-                    <div style="width: 50px; text-align: right;">{count}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    status_col1.markdown(cards.bar_chart_card("Lost Items by Status", lost_by_status, summary['lost']),
+                         unsafe_allow_html=True)
+    status_col2.markdown(cards.bar_chart_card("Found Items by Status", found_by_status, summary['found']),
+                         unsafe_allow_html=True)
     
     # Export options
     st.markdown("<div class='section-header'>Export Reports</div>", unsafe_allow_html=True)
@@ -935,6 +1053,7 @@ elif page == "Statistics and Reports":
             # Create a simple CSV string
             csv_data = "ID,Item Name,Type,Status,Date Lost,Date Reported,Location\n"
             
+            filtered_lost = analytics.items_in_period(rollups, store.get_item, 'Lost', report_start_date, report_end_date)
             for item in filtered_lost:
                 csv_data += f"{item['id']},{item['item_name']},{item['item_type']},{item['status']},{item['date_lost']},{item['date_reported']},{item['location']}\n"
             
@@ -948,6 +1067,7 @@ elif page == "Statistics and Reports":
             # Create a simple CSV string
             csv_data = "ID,Item Name,Type,Status,Date Found,Date Reported,Location\n"
             
+            filtered_found = analytics.items_in_period(rollups, store.get_item, 'Found', report_start_date, report_end_date)
             for item in filtered_found:
                 csv_data += f"{item['id']},{item['item_name']},{item['item_type']},{item['status']},{item['date_found']},{item['date_reported']},{item['location']}\n"
             
@@ -959,10 +1079,11 @@ elif page == "Statistics and Reports":
 # Add the Statistics page to the navigation
 if page == "Home":
     # Add a button to access statistics on the home page
-    if st.button("View Statistics and Reports"):
-        # Update the page selection and rerun
+    # Switch the page from a callback, which runs before the navigation radio is drawn
+    def open_statistics_page():
         st.session_state.page = "Statistics and Reports"
-        st.experimental_rerun()
+    
+    st.button("View Statistics and Reports", on_click=open_statistics_page)
 
 # Footer
 st.markdown("""
@@ -0,0 +1,199 @@
+import datetime
+import os
+import threading
+import time
+
+import item_store
+
+# Seconds between runs of the expiry and compaction jobs
+MAINTENANCE_INTERVAL = float(os.environ.get("LOSTANDFOUND_MAINTENANCE_INTERVAL", 3600))
+# Seconds one run of a job may take; jobs that work in chunks stop there and carry on next tick
+JOB_BUDGET = float(os.environ.get("LOSTANDFOUND_MAINTENANCE_BUDGET", 2.0))
+# Close items still Open this many days after they were reported; 0 turns it off
+AUTO_CLOSE_DAYS = int(os.environ.get("LOSTANDFOUND_AUTO_CLOSE_DAYS", 0))
+# Reject claims still Pending this many days after they were made; 0 turns it off
+CLAIM_EXPIRY_DAYS = int(os.environ.get("LOSTANDFOUND_CLAIM_EXPIRY_DAYS", 0))
+# Compact once this share of all records has been deleted since the last compaction
+COMPACT_AFTER = float(os.environ.get("LOSTANDFOUND_COMPACT_AFTER", 0.2))
+COMPACT_MIN_REMOVED = 1000
+
+# Records changed per store write, so a long job never holds the store lock for long
+CHUNK_SIZE = 500
+# Seconds between checks for due jobs
+TICK = 1.0
+
+
+# A job run every `interval` seconds. `run(deadline)` does the work and returns
+# (message, finished); jobs that can stop part-way check time.monotonic()
+# against the deadline and return unfinished, and are run again on the next tick.
+class Job:
+    def __init__(self, name, interval, run, budget):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.budget = budget
+        self.next_run = time.monotonic() + interval
+        self.runs = 0
+        self.over_budget = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_result = None
+        self.failed = False
+
+
+# Runs housekeeping jobs one at a time on a single background thread, so they
+# never overlap each other and never run inside a user's rerun
+class MaintenanceScheduler:
+    def __init__(self, tick=TICK):
+        self.tick = tick
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.jobs = {}
+        self.thread = None
+
+    def add(self, name, interval, run, budget=JOB_BUDGET):
+        with self.lock:
+            self.jobs[name] = Job(name, interval, run, budget)
+
+    # Ask for a job to run as soon as the scheduler thread is free
+    def request(self, name):
+        with self.lock:
+            self.jobs[name].next_run = 0
+        self.wake.set()
+
+    def run_job(self, job):
+        started = time.monotonic()
+        try:
+            message, finished = job.run(started + job.budget)
+            failed = False
+        # A failing job is reported in the admin dashboard and retried at its next interval;
+        # it must not take the scheduler thread, and every other job, down with it
+        except Exception as error:
+            message, finished, failed = f"{type(error).__name__}: {error}", True, True
+        duration = time.monotonic() - started
+
+        with self.lock:
+            job.runs += 1
+            job.over_budget += duration > job.budget
+            job.last_run = datetime.datetime.now()
+            job.last_duration = duration
+            job.last_result = message
+            job.failed = failed
+            job.next_run = time.monotonic() + (job.interval if finished else 0)
+
+    def run_due(self):
+        with self.lock:
+            now = time.monotonic()
+            due = [job for job in self.jobs.values() if job.next_run <= now]
+        for job in due:
+            self.run_job(job)
+
+    def loop(self):
+        while True:
+            self.wake.wait(self.tick)
+            self.wake.clear()
+            self.run_due()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, daemon=True, name="maintenance")
+                self.thread.start()
+
+    # Per-job run counts, timings and last result, for the admin dashboard
+    def stats(self):
+        with self.lock:
+            now = time.monotonic()
+            return [{
+                'job': job.name,
+                'interval': job.interval,
+                'budget': job.budget,
+                'runs': job.runs,
+                'over_budget': job.over_budget,
+                'last_run': job.last_run,
+                'last_duration': job.last_duration,
+                'last_result': job.last_result,
+                'failed': job.failed,
+                'next_in': max(0.0, job.next_run - now),
+            } for job in self.jobs.values()]
+
+
+# Function to get the cutoff date string for records older than `days`
+def cutoff(days):
+    return (datetime.date.today() - datetime.timedelta(days=days)).strftime(item_store.DATE_FORMAT)
+
+# Function to write ids a chunk at a time until all are done or the deadline passes.
+# The first chunk always runs, so a job makes progress however small its budget.
+# Returns how many records were changed and whether every chunk ran.
+def in_chunks(ids, write, deadline):
+    changed = 0
+    for start in range(0, len(ids), CHUNK_SIZE):
+        if start and time.monotonic() > deadline:
+            return changed, False
+        changed += write(ids[start:start + CHUNK_SIZE])
+    return changed, True
+
+# Function to make a job that closes items still Open `days` after they were reported
+def auto_close_job(store, days):
+    def run(deadline):
+        oldest = cutoff(days)
+        closed = 0
+        for kind in ('lost', 'found'):
+            with store.lock:
+                items = list(store.items(kind))
+            stale = [item.key for item in items if item['status'] == 'Open' and item['date_reported'] < oldest]
+
+            # Items claimed since the scan are left alone
+            def close(keys):
+                with store.lock:
+                    items = [store.get_item(key) for key in keys]
+                    still_open = [item.key for item in items if item is not None and item['status'] == 'Open']
+                    return len(store.set_items_status(kind, still_open, 'Closed'))
+
+            count, finished = in_chunks(stale, close, deadline)
+            closed += count
+            if not finished:
+                return f"Items closed so far: {closed}, continuing", False
+        return f"Items open for over {days} days closed: {closed}", True
+    return run
+
+# Function to make a job that rejects claims still Pending `days` after they were made,
+# which puts each claimed item back to Open
+def claim_expiry_job(store, days):
+    def run(deadline):
+        oldest = cutoff(days)
+        with store.lock:
+            claims = list(store.claims)
+        stale = [claim.key for claim in claims if claim['status'] == 'Pending' and claim['date_claimed'] < oldest]
+
+        # Claims reviewed since the scan are left alone
+        def expire(keys):
+            with store.lock:
+                claims = [store.get_claim(key) for key in keys]
+                pending = [claim.key for claim in claims if claim is not None and claim['status'] == 'Pending']
+                return len(store.set_claims_status(pending, 'Rejected'))
+
+        expired, finished = in_chunks(stale, expire, deadline)
+        if not finished:
+            return f"Claims expired so far: {expired}, continuing", False
+        return f"Claims pending for over {days} days expired: {expired}", True
+    return run
+
+# Function to make a job that compacts the store once enough records have been deleted
+def compact_job(store, share=COMPACT_AFTER, min_removed=COMPACT_MIN_REMOVED):
+    def run(deadline):
+        removed = store.removed
+        records = len(store.lost_items) + len(store.found_items) + len(store.claims) + removed
+        if removed < min_removed or removed < share * records:
+            return f"Not needed, records deleted since the last compaction: {removed}", True
+        store.compact()
+        return f"Compacted, records deleted since the last compaction: {removed}", True
+    return run
+
+# Function to schedule the store housekeeping jobs that are turned on
+def add_store_jobs(scheduler, store):
+    if AUTO_CLOSE_DAYS:
+        scheduler.add("Close stale items", MAINTENANCE_INTERVAL, auto_close_job(store, AUTO_CLOSE_DAYS))
+    if CLAIM_EXPIRY_DAYS:
+        scheduler.add("Expire pending claims", MAINTENANCE_INTERVAL, claim_expiry_job(store, CLAIM_EXPIRY_DAYS))
+    scheduler.add("Compact store and indexes", MAINTENANCE_INTERVAL, compact_job(store))
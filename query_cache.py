@@ -0,0 +1,42 @@
+import threading
+from collections import OrderedDict
+
+# Filter and search results kept in memory, as lists of item id keys
+CACHE_SIZE = 512
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'evicted': 0}
+
+
+# Function to get the item keys stored for a query, or None if there are none
+# or the data they were computed from has been written since (`version` moved on)
+def lookup(query, version):
+    with _cache_lock:
+        entry = _cache.get(query)
+        if entry is not None and entry[0] == version:
+            _cache.move_to_end(query)
+            _stats['hits'] += 1
+            return entry[1]
+        if entry is not None:
+            del _cache[query]
+            _stats['invalidated'] += 1
+        _stats['misses'] += 1
+        return None
+
+# Function to store a query's item keys with the version they were computed at.
+# Read the version before running the query, so a write made meanwhile leaves
+# the entry already stale rather than hiding the write.
+def remember(query, version, keys):
+    with _cache_lock:
+        _cache[query] = (version, keys)
+        _cache.move_to_end(query)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats['evicted'] += 1
+
+# Function to report how well the cache is doing, for the admin dashboard
+def cache_info():
+    with _cache_lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return dict(_stats, size=len(_cache), hit_rate=_stats['hits'] / lookups if lookups else 0.0)
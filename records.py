@@ -0,0 +1,225 @@
+import enum
+import sys
+from collections.abc import MutableMapping
+
+
+# Small string enums: each record holds a reference to one shared member, and
+# members compare, hash, print and serialise exactly like their plain value
+class Choice(str, enum.Enum):
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+class ItemType(Choice):
+    ELECTRONICS = "Electronics"
+    CLOTHING = "Clothing"
+    DOCUMENTS = "Documents"
+    KEYS = "Keys"
+    BAGS = "Bags"
+    JEWELRY = "Jewelry"
+    OTHER = "Other"
+
+
+class ItemStatus(Choice):
+    OPEN = "Open"
+    CLAIMED = "Claimed"
+    RETURNED = "Returned"
+    CLOSED = "Closed"
+
+
+class ClaimStatus(Choice):
+    PENDING = "Pending"
+    APPROVED = "Approved"
+    REJECTED = "Rejected"
+
+
+# Which side a claim is for, as shown to admins
+class ClaimedKind(Choice):
+    LOST = "Lost"
+    FOUND = "Found"
+
+
+# Function to turn a UUID string into its 16-byte key; None if it isn't one
+def uuid_key(value):
+    if isinstance(value, bytes):
+        return value if len(value) == 16 else None
+    try:
+        key = bytes.fromhex(value.replace("-", ""))
+    except (AttributeError, ValueError):
+        return None
+    return key if len(key) == 16 else None
+
+# Function to format a 16-byte key as the usual UUID string
+def uuid_str(key):
+    digits = key.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+# Function to share one string object per calendar day between all records
+def intern_date(value):
+    return sys.intern(value)
+
+
+# Base for records with a fixed set of fields held in __slots__.
+# Records read and write like the dicts they replace (record['status'],
+# record.get('date_returned'), ...); optional fields are simply left unset.
+class Record(MutableMapping):
+    __slots__ = ('_key',)
+    fields = ()
+    optional = ()
+    converters = {}
+    # Fields stored as 16-byte UUID keys, with the slot holding each
+    key_fields = {'id': '_key'}
+
+    # Sets for the membership checks done on every field access
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.field_set = frozenset(cls.fields)
+        cls.optional_set = frozenset(cls.optional)
+
+    def __init__(self, fields=(), **more):
+        for name, value in dict(fields, **more).items():
+            self[name] = value
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def id(self):
+        return uuid_str(self._key)
+
+    @id.setter
+    def id(self, value):
+        self._key = self.parse_key(value)
+
+    @staticmethod
+    def parse_key(value):
+        key = uuid_key(value)
+        if key is None:
+            raise ValueError(f"Not a UUID: {value!r}")
+        return key
+
+    def __getitem__(self, name):
+        if name not in self.field_set:
+            raise KeyError(name)
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        if name not in self.field_set:
+            raise KeyError(name)
+        convert = self.converters.get(name)
+        setattr(self, name, convert(value) if convert else value)
+
+    def __delitem__(self, name):
+        if name not in self.optional_set:
+            raise KeyError(name)
+        try:
+            delattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __iter__(self):
+        for name in self.fields:
+            if hasattr(self, name):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    # Overwrite every field with another record's, unsetting missing optional ones
+    def assign(self, other):
+        for name in self.fields:
+            if name in other:
+                self[name] = other[name]
+            elif name in self.optional:
+                self.pop(name, None)
+
+    # Build records from {field: list of values}, converting each column once.
+    # Empty values in optional columns leave the field unset.
+    @classmethod
+    def from_columns(cls, columns):
+        names = [name for name in cls.fields if name in columns]
+        slots, values = [], []
+        for name in names:
+            column = columns[name]
+            if name in cls.key_fields:
+                column = [cls.parse_key(value) for value in column]
+            elif name in cls.converters:
+                convert = cls.converters[name]
+                converted = {value: convert(value) if value else value for value in set(column)}
+                column = [converted[value] for value in column]
+            if name in cls.optional:
+                column = [value or None for value in column]
+            slots.append(cls.key_fields.get(name, name))
+            values.append(column)
+
+        new = object.__new__
+        records = []
+        for row in zip(*values):
+            record = new(cls)
+            for slot, value in zip(slots, row):
+                if value is not None:
+                    setattr(record, slot, value)
+            records.append(record)
+        return records
+
+
+ITEM_CONVERTERS = {
+    'item_type': ItemType,
+    'status': ItemStatus,
+    'date_lost': intern_date,
+    'date_found': intern_date,
+    'date_reported': intern_date,
+    'date_returned': intern_date,
+}
+
+
+class LostItem(Record):
+    __slots__ = ('item_type', 'item_name', 'description', 'location', 'date_lost', 'reporter_name',
+                 'contact_info', 'status', 'date_reported', 'image', 'date_returned', 'merged_from')
+    kind = 'lost'
+    fields = ('id',) + __slots__
+    optional = ('date_returned', 'merged_from')
+    converters = ITEM_CONVERTERS
+
+
+class FoundItem(Record):
+    __slots__ = ('item_type', 'item_name', 'description', 'location', 'date_found', 'founder_name',
+                 'contact_info', 'status', 'date_reported', 'image', 'date_returned', 'merged_from')
+    kind = 'found'
+    fields = ('id',) + __slots__
+    optional = ('date_returned', 'merged_from')
+    converters = ITEM_CONVERTERS
+
+
+class Claim(Record):
+    __slots__ = ('_item_key', 'item_type', 'claimer_name', 'contact_info', 'description', 'date_claimed', 'status')
+    kind = 'claim'
+    fields = ('id', 'item_id') + __slots__[1:]
+    converters = {
+        'item_type': ClaimedKind,
+        'status': ClaimStatus,
+        'date_claimed': intern_date,
+    }
+    key_fields = {'id': '_key', 'item_id': '_item_key'}
+
+    @property
+    def item_key(self):
+        return self._item_key
+
+    @property
+    def item_id(self):
+        return uuid_str(self._item_key)
+
+    @item_id.setter
+    def item_id(self, value):
+        self._item_key = self.parse_key(value)
+
+
+ITEM_RECORDS = {'lost': LostItem, 'found': FoundItem}
@@ -0,0 +1,100 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its my of on or
+the this that to was were with near last seen
+""".split())
+
+# Cached document norms are thrown away once the collection size has drifted
+# by this fraction, since every idf (and so every norm) has shifted with it
+NORM_DRIFT = 0.05
+
+
+# Function to split text into lowercase terms, dropping stopwords
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+# TF-IDF index over short texts, kept up to date one document at a time.
+# Raw term counts live in an inverted index (term -> {doc_id: tf}); idf is
+# applied at query time, so adding or removing a document only touches the
+# postings of its own terms. Queries score documents with an accumulator over
+# the postings of the query terms instead of comparing against every document.
+class SimilarityIndex:
+    def __init__(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self._norms = {}
+        self._norms_size = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_terms
+
+    def idf(self, term):
+        return math.log((len(self.doc_terms) + 1) / (len(self.postings.get(term, ())) + 1)) + 1
+
+    @staticmethod
+    def tf_weight(count):
+        return 1 + math.log(count)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self.doc_terms[doc_id] = terms
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._norms.pop(doc_id, None)
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+
+    def norm(self, doc_id):
+        size = len(self.doc_terms)
+        if abs(size - self._norms_size) > NORM_DRIFT * max(self._norms_size, 1):
+            self._norms.clear()
+            self._norms_size = size
+
+        norm = self._norms.get(doc_id)
+        if norm is None:
+            norm = math.sqrt(sum((self.tf_weight(count) * self.idf(term)) ** 2
+                                 for term, count in self.doc_terms[doc_id].items()))
+            self._norms[doc_id] = norm
+        return norm
+
+    # Top-k documents by cosine similarity to a piece of text
+    def query(self, text, k=5, exclude=None, min_score=0.0):
+        terms = Counter(tokenize(text))
+        query_weights = {term: self.tf_weight(count) * self.idf(term)
+                         for term, count in terms.items() if term in self.postings}
+        if not query_weights:
+            return []
+        # Terms no document contains still count towards the query's length
+        query_norm = math.sqrt(sum((self.tf_weight(count) * self.idf(term)) ** 2
+                                   for term, count in terms.items()))
+
+        scores = {}
+        for term, query_weight in query_weights.items():
+            idf = self.idf(term)
+            for doc_id, count in self.postings[term].items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * self.tf_weight(count) * idf
+        scores.pop(exclude, None)
+
+        ranked = ((score / (query_norm * self.norm(doc_id)), doc_id) for doc_id, score in scores.items())
+        return [(doc_id, score) for score, doc_id in heapq.nlargest(k, ranked) if score >= min_score]
+
@@ -0,0 +1,443 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import operator
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+import records
+
+# File layout, all integers little-endian:
+#   magic | u32 header length | JSON header
+#   blocks: u8 table | u32 rows | u16 columns, then for each column
+#           u8 name length | name | u8 encoding | u32 payload length | zlib payload
+#   u8 0 marks the end, so a truncated file is detected instead of half-restored
+MAGIC = b"LFSNAP01"
+
+# Rows per block; restore reads one block of a file at a time
+BLOCK_ROWS = 16384
+
+TABLE_END, TABLE_LOST, TABLE_FOUND, TABLE_CLAIMS, TABLE_DELETED = range(5)
+ITEM_TABLES = {TABLE_LOST: 'lost', TABLE_FOUND: 'found'}
+
+# Plain columns store u32 string lengths followed by the UTF-8 data; dictionary
+# columns store the distinct values that way plus one u8 or u16 code per row
+PLAIN, DICT8, DICT16 = range(3)
+
+# One column per record field; unset optional fields are written as empty strings
+ITEM_COLUMNS = {kind: record.fields for kind, record in records.ITEM_RECORDS.items()}
+CLAIM_COLUMNS = records.Claim.fields
+
+# Snapshot chains kept when pruning old files
+KEEP_FULL = 2
+
+FILE_PATTERN = re.compile(r"^(full|delta)-(\d{8})\.lfs$")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+# Column encoding
+
+# Function to encode a list of strings as u32 lengths followed by their UTF-8 bytes
+def encode_strings(values):
+    data = [value.encode() for value in values]
+    return struct.pack(f"<{len(data)}I", *map(len, data)) + b"".join(data)
+
+# Function to decode `count` strings written by encode_strings
+def decode_strings(payload, count):
+    lengths = struct.unpack_from(f"<{count}I", payload)
+    data = payload[4 * count:]
+    # ASCII text can be decoded once and sliced by character
+    if data.isascii():
+        data = data.decode()
+        values, end = [], 0
+        for length in lengths:
+            values.append(data[end:end + length])
+            end += length
+        return values
+    values, end = [], 0
+    for length in lengths:
+        values.append(data[end:end + length].decode())
+        end += length
+    return values
+
+# Function to encode one column, dictionary-coding it when it has few distinct values
+def encode_column(values):
+    distinct = list(dict.fromkeys(values))
+    if len(distinct) <= 0xFFFF and len(distinct) * 2 <= len(values):
+        codes = {value: code for code, value in enumerate(distinct)}
+        encoding, code_format = (DICT8, "B") if len(distinct) <= 0x100 else (DICT16, "H")
+        payload = (struct.pack("<H", len(distinct) - 1) + encode_strings(distinct)
+                   + struct.pack(f"<{len(values)}{code_format}", *(codes[value] for value in values)))
+        return encoding, payload
+    return PLAIN, encode_strings(values)
+
+# Function to decode one column written by encode_column
+def decode_column(encoding, payload, count):
+    if encoding == PLAIN:
+        return decode_strings(payload, count)
+    size = struct.unpack_from("<H", payload)[0] + 1
+    distinct = decode_strings(payload[2:], size)
+    offset = 2 + 4 * size + sum(len(value.encode()) for value in distinct)
+    code_format = "B" if encoding == DICT8 else "H"
+    codes = struct.unpack_from(f"<{count}{code_format}", payload, offset)
+    return [distinct[code] for code in codes]
+
+
+# Block reading and writing
+
+def write_block(output, table, names, columns):
+    rows = len(columns[0]) if columns else 0
+    output.write(struct.pack("<BIH", table, rows, len(names)))
+    for name, values in zip(names, columns):
+        encoding, payload = encode_column(values)
+        payload = zlib.compress(payload, 1)
+        output.write(struct.pack("<B", len(name)) + name.encode()
+                     + struct.pack("<BI", encoding, len(payload)) + payload)
+
+def read_exact(source, size):
+    data = source.read(size)
+    if len(data) != size:
+        raise SnapshotError("Snapshot file is truncated")
+    return data
+
+# Function to read the header of a snapshot file
+def read_header(source):
+    if source.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Not a snapshot file")
+    size = struct.unpack("<I", read_exact(source, 4))[0]
+    return json.loads(read_exact(source, size))
+
+# Function to yield (table, {column: values}) one block at a time
+def read_blocks(source):
+    while True:
+        table = struct.unpack("<B", read_exact(source, 1))[0]
+        if table == TABLE_END:
+            return
+        rows, column_count = struct.unpack("<IH", read_exact(source, 6))
+        columns = {}
+        for _ in range(column_count):
+            name = read_exact(source, struct.unpack("<B", read_exact(source, 1))[0]).decode()
+            encoding, size = struct.unpack("<BI", read_exact(source, 5))
+            try:
+                payload = zlib.decompress(read_exact(source, size))
+                columns[name] = decode_column(encoding, payload, rows)
+            except (zlib.error, struct.error, IndexError, UnicodeDecodeError) as error:
+                raise SnapshotError(f"Corrupt column {name}: {error}")
+        yield table, columns
+
+
+# Images live next to the snapshots, one file per distinct image, named by its
+# SHA-256; records only carry that name. Identical photos are stored once and
+# an image already written by an earlier snapshot is never written again.
+class ImageStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest + ".img")
+
+    # Returns "" for an image that isn't valid base64, so one bad record loses
+    # its photo instead of failing the whole snapshot
+    def save(self, image):
+        if not image:
+            return ""
+        try:
+            data = base64.b64decode(image, validate=True)
+        except (binascii.Error, TypeError):
+            return ""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as output:
+                output.write(data)
+            os.replace(temporary, path)
+        return digest
+
+    def load(self, digest):
+        if not digest:
+            return ""
+        try:
+            with open(self.path(digest), "rb") as source:
+                return base64.b64encode(source.read()).decode()
+        except FileNotFoundError:
+            return ""
+
+
+# Function to turn records into column lists, reading fields as attributes
+def record_columns(record_type, rows, images=None):
+    columns = []
+    for name in record_type.fields:
+        if name == 'image':
+            columns.append([images.save(row.image) for row in rows])
+        elif name == 'merged_from':
+            columns.append([json.dumps(row.merged_from) if getattr(row, 'merged_from', None) else "" for row in rows])
+        elif name in record_type.optional:
+            columns.append([getattr(row, name, None) or "" for row in rows])
+        else:
+            columns.append(list(map(operator.attrgetter(name), rows)))
+    return columns
+
+# Function to turn a decoded block back into item records
+def items_from_columns(kind, columns, images):
+    columns['image'] = [images.load(digest) for digest in columns['image']]
+    if 'merged_from' in columns:
+        columns['merged_from'] = [json.loads(value) if value else None for value in columns['merged_from']]
+    return records.ITEM_RECORDS[kind].from_columns(columns)
+
+# Function to turn a decoded block back into claim records
+def claims_from_columns(columns):
+    return records.Claim.from_columns(columns)
+
+
+# Function to check that a decoded block can be turned back into records,
+# without keeping them or loading any photos
+def check_block(table, columns):
+    if table in ITEM_TABLES:
+        columns = dict(columns)
+        if len(columns.pop('image')) != len(columns['id']):
+            raise SnapshotError("Image column has the wrong length")
+        if 'merged_from' in columns:
+            columns['merged_from'] = [json.loads(value) if value else None for value in columns['merged_from']]
+        records.ITEM_RECORDS[ITEM_TABLES[table]].from_columns(columns)
+    elif table == TABLE_CLAIMS:
+        claims_from_columns(columns)
+    elif table == TABLE_DELETED:
+        if any(records.uuid_key(record_id) is None for record_id in columns['id']):
+            raise SnapshotError("Deleted ids must be UUIDs")
+    else:
+        raise SnapshotError(f"Unknown table {table}")
+
+# Function to call `use(table, columns)` for every block of a snapshot file in turn
+def each_block(path, use):
+    with open(path, "rb") as source:
+        try:
+            read_header(source)
+            for table, columns in read_blocks(source):
+                use(table, columns)
+        except (KeyError, ValueError) as error:
+            raise SnapshotError(f"Corrupt snapshot {os.path.basename(path)}: {error}")
+
+# Function to read whether a full snapshot holds the whole dataset. Files
+# written before the flag existed count as complete; unreadable ones don't.
+def is_complete(path):
+    try:
+        with open(path, "rb") as source:
+            return read_header(source).get('complete', True)
+    except (OSError, ValueError, SnapshotError):
+        return False
+
+
+# Writes full and incremental snapshots of a store into one directory and
+# restores a chain: a full snapshot plus every delta written on top of it.
+# A delta holds the records written since the previous snapshot and the ids
+# deleted since then, taken from the store's change journal.
+#
+# The store lives in memory and the journal only covers this process, so
+# deltas are only written on top of a chain this process started or restored.
+# A process that starts on an existing directory without restoring holds only
+# part of the data; its full snapshots are marked incomplete, and the newest
+# complete chain is the one restored and never pruned.
+class SnapshotManager:
+    def __init__(self, store, directory):
+        self.store = store
+        self.directory = directory
+        self.images = ImageStore(os.path.join(directory, "images"))
+        self.lock = threading.Lock()
+        self.last_run = None
+        # Sequence of the full snapshot this process wrote or restored, which its deltas extend
+        self.base = None
+        # Whether the store holds the whole dataset: true on a new directory or after a restore
+        self.complete = not self.files()
+        store.start_journal()
+
+    def files(self):
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for name in os.listdir(self.directory):
+            match = FILE_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(2)), match.group(1), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def next_sequence(self):
+        files = self.files()
+        return files[-1][0] + 1 if files else 1
+
+    # Each full snapshot with the deltas written after it and before the next full one
+    def chains(self):
+        chains = []
+        for entry in self.files():
+            if entry[1] == 'full':
+                chains.append([entry])
+            elif chains:
+                chains[-1].append(entry)
+        return chains
+
+    # Newest chain whose full snapshot holds the whole dataset
+    def chain(self):
+        for chain in reversed(self.chains()):
+            if is_complete(chain[0][2]):
+                return chain
+        return []
+
+    def write(self, kind, tables, header):
+        sequence = self.next_sequence()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{kind}-{sequence:08d}.lfs")
+        header = dict(header, kind=kind, sequence=sequence, created=datetime.datetime.now().isoformat())
+        encoded = json.dumps(header).encode()
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as output:
+            output.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+            for table, names, records, to_columns in tables:
+                for start in range(0, len(records), BLOCK_ROWS):
+                    write_block(output, table, names, to_columns(records[start:start + BLOCK_ROWS]))
+            output.write(struct.pack("<B", TABLE_END))
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, path)
+        self.last_run = {'kind': kind, 'path': path, 'time': header['created'], 'records': header['records']}
+        return self.last_run
+
+    def tables(self, lost, found, claims, deleted=()):
+        return [
+            (TABLE_LOST, ITEM_COLUMNS['lost'], lost, lambda rows: record_columns(records.LostItem, rows, self.images)),
+            (TABLE_FOUND, ITEM_COLUMNS['found'], found, lambda rows: record_columns(records.FoundItem, rows, self.images)),
+            (TABLE_CLAIMS, CLAIM_COLUMNS, claims, lambda rows: record_columns(records.Claim, rows)),
+            (TABLE_DELETED, ('id',), list(deleted), lambda rows: [list(rows)]),
+        ]
+
+    # Write every item and claim. Only the lists are copied under the store lock;
+    # a record edited while the file is written is also in the next delta.
+    def full(self):
+        with self.lock:
+            return self._full()
+
+    def _full(self):
+        with self.store.lock:
+            lost, found, claims = list(self.store.lost_items), list(self.store.found_items), list(self.store.claims)
+            changes = self.store.take_changes()
+            version = self.store.version
+        try:
+            result = self.write('full', self.tables(lost, found, claims),
+                                {'version': version, 'records': len(lost) + len(found) + len(claims),
+                                 'complete': self.complete})
+        except Exception:
+            self.store.mark_changed(changes)
+            raise
+        self.base = int(FILE_PATTERN.match(os.path.basename(result['path'])).group(2))
+        self.prune()
+        return result
+
+    # Write the records changed since the last snapshot. The first write of a
+    # process, or one after another process wrote a newer full snapshot, starts a
+    # new chain with a full snapshot instead. Returns None if nothing changed.
+    def delta(self):
+        with self.lock:
+            chains = self.chains()
+            if self.base is None or not chains or chains[-1][0][0] != self.base:
+                with self.store.lock:
+                    unchanged = chains and not self.store.changed_ids
+                return None if unchanged else self._full()
+
+            with self.store.lock:
+                changes = self.store.take_changes()
+                if not changes:
+                    return None
+                lost, found, claims, deleted = [], [], [], []
+                for key in changes:
+                    item = self.store.get_item(key)
+                    if item is not None:
+                        (lost if item.kind == 'lost' else found).append(item)
+                    elif self.store.get_claim(key) is not None:
+                        claims.append(self.store.get_claim(key))
+                    else:
+                        deleted.append(records.uuid_str(key))
+                version = self.store.version
+            try:
+                return self.write('delta', self.tables(lost, found, claims, deleted),
+                                  {'version': version, 'records': len(changes)})
+            except Exception:
+                self.store.mark_changed(changes)
+                raise
+
+    # Delete snapshot chains older than the newest KEEP_FULL full snapshots,
+    # except the newest complete chain, which is kept however old it is
+    def prune(self):
+        chains = self.chains()
+        kept = chains[-KEEP_FULL:] + [self.chain()]
+        for chain in chains[:-KEEP_FULL]:
+            if chain not in kept:
+                for _, _, path in chain:
+                    os.remove(path)
+
+    # Replace the store's contents with the newest complete snapshot chain. Every
+    # file is first read to its end marker without keeping anything, so a
+    # truncated or corrupt file leaves the live data as it was; then the chain is
+    # read again and applied one block at a time. The search and duplicate
+    # indexes are rebuilt once, in the background, rather than as blocks are applied.
+    def restore(self):
+        with self.lock:
+            chain = self.chain()
+            if not chain:
+                raise SnapshotError("No full snapshot to restore from")
+            started = time.perf_counter()
+            for _, _, path in chain:
+                each_block(path, check_block)
+
+            with self.store.lock:
+                self.store.clear()
+                for _, kind, path in chain:
+                    each_block(path, lambda table, columns: self.apply_block(kind, table, columns))
+                self.store.take_changes()
+                counts = {'lost': len(self.store.lost_items), 'found': len(self.store.found_items),
+                          'claims': len(self.store.claims)}
+            self.base = chain[0][0] if chain[0] == self.chains()[-1][0] else None
+            self.complete = True
+            threading.Thread(target=self.store.rebuild_indexes, daemon=True, name="index-rebuild").start()
+            return dict(counts, files=len(chain), seconds=time.perf_counter() - started)
+
+    def apply_block(self, kind, table, columns):
+        if table in ITEM_TABLES:
+            items = items_from_columns(ITEM_TABLES[table], columns, self.images)
+            if kind == 'full':
+                self.store.add_items(ITEM_TABLES[table], items, index=False)
+            else:
+                self.store.put_items(ITEM_TABLES[table], items, index=False)
+        elif table == TABLE_CLAIMS:
+            self.store.put_claims(claims_from_columns(columns))
+        elif table == TABLE_DELETED:
+            self.store.remove_records(columns['id'])
+
+    # Files in the directory with their sizes, oldest first; full snapshots say whether they are complete
+    def status(self):
+        return [{'file': os.path.basename(path), 'kind': kind, 'bytes': os.path.getsize(path),
+                 'complete': is_complete(path) if kind == 'full' else None}
+                for _, kind, path in self.files()]
+
+
+# Function to make a maintenance job that writes a full or incremental snapshot.
+# A failure is kept on the manager for the Backups tab, then passed on to the scheduler.
+def scheduled_job(manager, full):
+    def run(deadline):
+        try:
+            result = manager.full() if full else manager.delta()
+        except (OSError, SnapshotError) as error:
+            manager.last_run = {'kind': 'error', 'time': datetime.datetime.now().isoformat(), 'error': str(error)}
+            raise
+        if result is None:
+            return "Nothing changed since the last snapshot", True
+        return f"{result['records']} records to {os.path.basename(result['path'])}", True
+    return run
@@ -0,0 +1,29 @@
+import pytest
+
+import item_store
+
+FIELDS = {
+    'item_type': 'Keys', 'item_name': 'Keys', 'description': 'Three keys on a red ring', 'location': 'Library',
+    'date_lost': '2025-03-01', 'reporter_name': 'Ann', 'contact_info': 'ann@example.com',
+}
+
+
+def test_new_item_rejects_non_string_fields():
+    with pytest.raises(ValueError):
+        item_store.new_item('lost', dict(FIELDS, location=123))
+
+
+def test_failed_add_leaves_store_unchanged():
+    store = item_store.ItemStore()
+    good = item_store.new_item('lost', FIELDS)
+    bad = item_store.new_item('lost', FIELDS)
+    bad['location'] = 123
+
+    with pytest.raises(AttributeError):
+        store.add_items('lost', [good, bad])
+
+    assert store.lost_items == []
+    assert store.get_item(good['id']) is None
+    assert len(store.similarity['lost']) == 0
+    assert len(store.duplicates['lost']) == 0
+    assert store.version == 0
@@ -0,0 +1,143 @@
+import base64
+import os
+
+import pytest
+
+import item_store
+import snapshot
+
+PHOTO = base64.b64encode(b"\x89PNG\r\n\x1a\n" + bytes(range(256))).decode()
+
+
+def make_item(kind, name, image=""):
+    fields = {
+        'item_type': 'Keys', 'item_name': name, 'description': f"{name} on a red ring",
+        'location': 'Library', 'contact_info': 'desk@example.com', 'image': image,
+    }
+    if kind == 'lost':
+        fields.update(date_lost='2025-03-01', reporter_name='Ann')
+    else:
+        fields.update(date_found='2025-03-02', founder_name='Ben')
+    return item_store.new_item(kind, fields)
+
+def make_store():
+    store = item_store.ItemStore()
+    for number in range(5):
+        store.add_item('lost', make_item('lost', f"Lost keys {number}", PHOTO if number == 0 else ""))
+        store.add_item('found', make_item('found', f"Found keys {number}"))
+    return store
+
+def contents(store):
+    return [[dict(record) for record in records] for records in (store.lost_items, store.found_items, store.claims)]
+
+
+def test_round_trip_full_and_deltas(tmp_path):
+    store = make_store()
+    manager = snapshot.SnapshotManager(store, str(tmp_path))
+    manager.full()
+
+    claim = store.submit_claim('found', store.found_items[0]['id'], 'Cat', 'cat@example.com', 'Mine, it has a tag')
+    store.set_item_status('lost', store.lost_items[1]['id'], 'Returned')
+    store.delete_item('lost', store.lost_items[2]['id'])
+    store.add_item('found', make_item('found', "Ключи"))
+    manager.delta()
+    store.set_claim_status(claim['id'], 'Approved')
+    manager.delta()
+
+    restored = item_store.ItemStore()
+    result = snapshot.SnapshotManager(restored, str(tmp_path)).restore()
+
+    assert result['files'] == 3
+    assert contents(restored) == contents(store)
+    assert restored.lost_items[0]['image'] == PHOTO
+
+
+def test_truncated_file_leaves_store_untouched(tmp_path):
+    manager = snapshot.SnapshotManager(make_store(), str(tmp_path))
+    path = manager.full()['path']
+    with open(path, "r+b") as output:
+        output.truncate(os.path.getsize(path) - 1)
+
+    live = item_store.ItemStore()
+    live.add_item('lost', make_item('lost', "Umbrella"))
+    before = contents(live)
+
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.SnapshotManager(live, str(tmp_path)).restore()
+    assert contents(live) == before
+
+
+def test_bad_image_only_drops_that_photo(tmp_path):
+    store = make_store()
+    store.lost_items[1]['image'] = "not base64!"
+    manager = snapshot.SnapshotManager(store, str(tmp_path))
+    manager.full()
+
+    restored = item_store.ItemStore()
+    snapshot.SnapshotManager(restored, str(tmp_path)).restore()
+
+    assert len(restored.lost_items) == 5
+    assert restored.lost_items[0]['image'] == PHOTO
+    assert restored.lost_items[1]['image'] == ""
+
+
+def test_new_item_rejects_bad_image():
+    with pytest.raises(ValueError):
+        make_item('lost', "Wallet", image="abc")
+
+
+def test_revisions_never_repeat_after_restore(tmp_path):
+    store = make_store()
+    manager = snapshot.SnapshotManager(store, str(tmp_path))
+    manager.full()
+    item_id = store.lost_items[0]['id']
+    before = store.revision(item_id)
+
+    manager.restore()
+
+    assert store.revision(item_id) not in (0, before)
+
+
+def test_new_process_starts_its_own_chain_and_keeps_the_complete_one(tmp_path):
+    store = make_store()
+    first = snapshot.SnapshotManager(store, str(tmp_path))
+    first.full()
+    store.delete_item('lost', store.lost_items[0]['id'])
+    first.delta()
+
+    # A restarted process that doesn't restore only holds what was entered since
+    restarted = item_store.ItemStore()
+    second = snapshot.SnapshotManager(restarted, str(tmp_path))
+    assert second.delta() is None
+    restarted.add_item('lost', make_item('lost', "Umbrella"))
+    assert second.delta()['kind'] == 'full'
+    for _ in range(snapshot.KEEP_FULL + 1):
+        second.full()
+
+    second.restore()
+    assert contents(restarted) == contents(store)
+    assert second.delta() is None
+    restarted.add_item('found', make_item('found', "Scarf"))
+    assert second.delta()['kind'] == 'full'
+    assert [entry['complete'] for entry in second.status() if entry['kind'] == 'full'][-1] is True
+
+
+def test_rebuild_overlapping_a_restore_is_discarded(tmp_path, monkeypatch):
+    store = make_store()
+    manager = snapshot.SnapshotManager(store, str(tmp_path))
+    manager.full()
+    store.add_item('lost', make_item('lost', "Umbrella"))
+
+    # Restore while a rebuild of the old contents, umbrella and all, is part-way through
+    item_text = item_store.item_text
+    def restore_once(item):
+        monkeypatch.setattr(item_store, 'item_text', item_text)
+        manager.restore()
+        return item_text(item)
+    monkeypatch.setattr(item_store, 'item_text', restore_once)
+    store.rebuild_indexes()
+
+    assert set(store.similarity['lost'].doc_terms) <= {item.key for item in store.lost_items}
+    for item in store.lost_items:
+        store.similar_items('lost', item_store.item_text(item))
+        store.find_duplicates('lost', item)